@@ -0,0 +1,46 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 1: Developing RESTful APIs with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Encodes the types orjson doesn't handle itself, or handles differently,
+# such as datetimes, Decimals and lazy strings, like the JSONRenderer
+encode_default = JSONEncoder().default
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    A JSONRenderer that encodes with orjson when it is installed and
+    renders exactly like the JSONRenderer otherwise.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if (orjson is None or data is None or
+                self.ensure_ascii or not self.compact or
+                self.get_indent(accepted_media_type, renderer_context)
+                is not None):
+            return super(FastJSONRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=encode_default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            return super(FastJSONRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+        # We escape \u2028 and \u2029 like the JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(
+                b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029')
+        return ret
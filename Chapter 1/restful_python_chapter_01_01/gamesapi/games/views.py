@@ -6,8 +6,8 @@ Publisher: Packt Publishing Ltd. - http://www.packtpub.com
 """
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework.renderers import JSONRenderer
-from rest_framework.parsers import JSONParser
+from games.renderers import FastJSONRenderer
+from games.parsers import FastJSONParser
 from rest_framework import status
 from games.models import Game
 from games.serializers import GameSerializer
@@ -15,7 +15,7 @@ from games.serializers import GameSerializer
 
 class JSONResponse(HttpResponse):
     def __init__(self, data, **kwargs):
-        content = JSONRenderer().render(data)
+        content = FastJSONRenderer().render(data)
         kwargs['content_type'] = 'application/json'
         super(JSONResponse, self).__init__(content, **kwargs)
 
@@ -28,7 +28,7 @@ def game_list(request):
         return JSONResponse(games_serializer.data)
 
     elif request.method == 'POST':
-        game_data = JSONParser().parse(request)
+        game_data = FastJSONParser().parse(request)
         game_serializer = GameSerializer(data=game_data)
         if game_serializer.is_valid():
             game_serializer.save()
@@ -48,7 +48,7 @@ def game_detail(request, pk):
         return JSONResponse(game_serializer.data)
 
     elif request.method == 'PUT':
-        game_data = JSONParser().parse(request)
+        game_data = FastJSONParser().parse(request)
         game_serializer = GameSerializer(game, data=game_data)
         if game_serializer.is_valid():
             game_serializer.save()
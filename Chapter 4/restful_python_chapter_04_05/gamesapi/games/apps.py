@@ -9,3 +9,7 @@ from django.apps import AppConfig
 
 class GamesConfig(AppConfig):
     name = 'games'
+
+    def ready(self):
+        # Connect the signal receivers
+        import games.signals
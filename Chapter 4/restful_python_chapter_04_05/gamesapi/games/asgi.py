@@ -0,0 +1,173 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+
+
+def get_asgi_threads():
+    return getattr(settings, 'GAMES_ASGI_THREADS', 10)
+
+
+def get_environ(scope, body):
+    """
+    Return the WSGI environ for the scope of an ASGI HTTP request.
+    """
+    # WSGI strings are bytes decoded as latin-1
+    script_name = scope.get('root_path', '')
+    path = scope['path']
+    if script_name and path.startswith(script_name):
+        path = path[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('127.0.0.1', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/{0}'.format(scope.get('http_version', '1.1')),
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+            continue
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = 'HTTP_' + name
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+class ASGIHandler(object):
+    """
+    ASGI application that serves a WSGI application. The request body is
+    received and the response is sent by the event loop, so slow clients
+    don't hold a thread. Only running the view takes one of the
+    GAMES_ASGI_THREADS worker threads, where the ORM queries block as
+    usual. Streaming responses keep their thread until they are sent.
+    """
+    def __init__(self, wsgi_application, threads=None):
+        self.wsgi_application = wsgi_application
+        self.threads = threads
+        self.executor = None
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                self.threads or get_asgi_threads())
+        return self.executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(
+                'Unsupported ASGI scope type {0}.'.format(scope['type']))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.executor is not None:
+                    self.executor.shutdown(wait=True)
+                    self.executor = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        environ = get_environ(scope, b''.join(chunks))
+        loop = asyncio.get_event_loop()
+        # Regular responses fit in the queue with their end, so their
+        # thread never waits for the client. Streaming responses wait
+        # when a few chunks are queued.
+        queue = asyncio.Queue(maxsize=3)
+        future = loop.run_in_executor(
+            self.get_executor(), self.run_wsgi, environ, queue, loop)
+        error = None
+        while True:
+            message = await queue.get()
+            if message is None:
+                break
+            if error is None:
+                try:
+                    await send(message)
+                except Exception as exception:
+                    # The thread still has to put its remaining messages
+                    error = exception
+        await future
+        if error is not None:
+            raise error
+
+    def run_wsgi(self, environ, queue, loop):
+        # Runs in a worker thread
+        def put(message):
+            asyncio.run_coroutine_threadsafe(queue.put(message), loop).result()
+
+        response_start = {}
+
+        def start_response(status, headers, exc_info=None):
+            response_start['status'] = int(status.split(' ', 1)[0])
+            response_start['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers]
+
+        iterable = None
+        try:
+            iterable = self.wsgi_application(environ, start_response)
+            if isinstance(iterable, (list, tuple)) or getattr(
+                    iterable, 'streaming', True) is False:
+                # The whole body is available, the thread is released
+                # before a slow client receives it
+                body = b''.join(iterable)
+                put(dict(type='http.response.start', **response_start))
+                put({'type': 'http.response.body', 'body': body})
+            else:
+                started = False
+                for chunk in iterable:
+                    if not started:
+                        put(dict(type='http.response.start', **response_start))
+                        started = True
+                    if chunk:
+                        put({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True})
+                if not started:
+                    put(dict(type='http.response.start', **response_start))
+                put({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Sends request_finished, which closes this thread's connections
+            if hasattr(iterable, 'close'):
+                iterable.close()
+            put(None)
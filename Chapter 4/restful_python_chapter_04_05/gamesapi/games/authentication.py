@@ -0,0 +1,94 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import force_bytes
+from rest_framework.authentication import BasicAuthentication
+
+
+class VerifiedCredentialsCache(object):
+    """
+    A bounded, thread safe LRU cache of verified credentials. Each entry
+    maps a keyed hash of the username and password to the user's primary
+    key and the password hash that was verified, and expires after the
+    timeout.
+    """
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_key(self, userid, password):
+        # Passwords are never kept, not even as an unkeyed hash
+        return hmac.new(
+            force_bytes(settings.SECRET_KEY),
+            force_bytes('{0}:{1}'.format(userid, password)),
+            hashlib.sha256).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[:2]
+
+    def set(self, key, user_pk, password_hash):
+        timeout = getattr(settings, 'GAMES_CREDENTIALS_CACHE_TIMEOUT', 300)
+        max_size = getattr(settings, 'GAMES_CREDENTIALS_CACHE_SIZE', 1000)
+        with self.lock:
+            self.entries[key] = (user_pk, password_hash, time.time() + timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+verified_credentials = VerifiedCredentialsCache()
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    HTTP Basic authentication that only runs the password hasher the first
+    time it sees some credentials within the cache timeout.
+
+    A cache hit still loads the user, which the request needs anyway, and
+    only succeeds if the user is active and its password hash is the one
+    that was verified. Changing the password or deactivating the user
+    invalidates the cached credentials in every worker.
+    """
+    def authenticate_credentials(self, userid, password):
+        key = verified_credentials.get_key(userid, password)
+        entry = verified_credentials.get(key)
+        if entry is not None:
+            user_pk, password_hash = entry
+            user = get_user_model()._default_manager.filter(
+                pk=user_pk).first()
+            if (user is not None and user.is_active and
+                    constant_time_compare(user.password, password_hash)):
+                return (user, None)
+            verified_credentials.delete(key)
+        user, auth = super(
+            CachedBasicAuthentication, self).authenticate_credentials(
+                userid, password)
+        verified_credentials.set(key, user.pk, user.password)
+        return (user, auth)
@@ -0,0 +1,152 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import threading
+import time
+from bisect import bisect_left
+from bisect import insort
+from django.conf import settings
+from django.db.models.functions import Lower
+from games.conditional import get_model_versions
+from games.models import Game
+from games.models import Player
+
+
+def get_name_key(name):
+    # The same folding as the SQLite lower() function for ASCII names
+    return name.lower()
+
+
+class NameIndex(object):
+    """
+    The names of a model in a list sorted by their lowercase key, so the
+    names that start with a prefix are found with a binary search.
+
+    The index is loaded the first time it is used and holds at most
+    GAMES_AUTOCOMPLETE_MAX_NAMES names, the first ones by key. Prefixes
+    whose names could continue past the last loaded key are answered by
+    the database. The receivers apply the writes of this process right
+    away, and every GAMES_AUTOCOMPLETE_REFRESH seconds the version of
+    the model is checked to reload the writes of other processes.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+        # (key, name, pk) tuples
+        self.entries = None
+        self.entries_by_pk = {}
+        self.truncated = False
+        self.version = None
+        self.checked = None
+
+    def get_max_names(self):
+        return getattr(settings, 'GAMES_AUTOCOMPLETE_MAX_NAMES', 100000)
+
+    def load(self):
+        max_names = self.get_max_names()
+        # Read the version first, so writes during the load reload again
+        version = get_model_versions([self.model])[0][0]
+        rows = self.model._default_manager.order_by(
+            Lower('name'), 'name').values_list('name', 'pk')[:max_names + 1]
+        entries = sorted((get_name_key(name), name, pk) for name, pk in rows)
+        truncated = len(entries) > max_names
+        del entries[max_names:]
+        self.entries = entries
+        self.entries_by_pk = dict((entry[2], entry) for entry in entries)
+        self.truncated = truncated
+        self.version = version
+        self.checked = time.monotonic()
+
+    def clear(self):
+        with self.lock:
+            self.entries = None
+            self.entries_by_pk = {}
+
+    def refresh(self):
+        if self.entries is None:
+            self.load()
+            return
+        interval = getattr(settings, 'GAMES_AUTOCOMPLETE_REFRESH', 5)
+        if time.monotonic() - self.checked < interval:
+            return
+        self.checked = time.monotonic()
+        if get_model_versions([self.model])[0][0] != self.version:
+            self.load()
+
+    def covers(self, key):
+        # Keys after the last loaded one were left out of a full index
+        return not self.truncated or (
+            self.entries and key <= self.entries[-1][0])
+
+    def add(self, pk, name):
+        with self.lock:
+            if self.entries is None:
+                return
+            self.discard(pk)
+            entry = (get_name_key(name), name, pk)
+            if not self.covers(entry[0]):
+                return
+            insort(self.entries, entry)
+            self.entries_by_pk[pk] = entry
+            if len(self.entries) > self.get_max_names():
+                del self.entries_by_pk[self.entries.pop()[2]]
+                self.truncated = True
+
+    def remove(self, pk):
+        with self.lock:
+            if self.entries is not None:
+                self.discard(pk)
+
+    def discard(self, pk):
+        entry = self.entries_by_pk.pop(pk, None)
+        if entry is not None:
+            del self.entries[bisect_left(self.entries, entry)]
+
+    def suggest(self, prefix, limit):
+        """
+        Return up to limit names that start with the prefix, ignoring
+        case, in alphabetical order.
+        """
+        key = get_name_key(prefix)
+        with self.lock:
+            self.refresh()
+            names = []
+            position = bisect_left(self.entries, (key,))
+            for entry in self.entries[position:position + limit]:
+                if not entry[0].startswith(key):
+                    break
+                names.append(entry[1])
+            # Names after the last loaded key may start with the prefix
+            # unless that key is past every key that does
+            complete = (
+                len(names) == limit or
+                not self.truncated or
+                (self.entries and not self.entries[-1][0].startswith(key) and
+                 self.entries[-1][0] > key))
+        if complete:
+            return names
+        return list(self.model._default_manager.filter(
+            name__istartswith=prefix).order_by(
+                Lower('name'), 'name').values_list('name', flat=True)[:limit])
+
+
+# The name indexes served by the autocomplete view
+NAME_INDEXES = {
+    Game: NameIndex(Game),
+    Player: NameIndex(Player),
+}
+
+
+def index_name(instance):
+    index = NAME_INDEXES.get(type(instance))
+    if index is not None:
+        index.add(instance.pk, instance.name)
+
+
+def unindex_name(instance):
+    index = NAME_INDEXES.get(type(instance))
+    if index is not None:
+        index.remove(instance.pk)
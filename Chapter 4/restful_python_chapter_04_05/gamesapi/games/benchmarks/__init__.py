@@ -0,0 +1,173 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import SimpleRateThrottle
+from games.models import GameCategory
+from games.models import Game
+from games.models import Player
+from games.models import PlayerScore
+
+
+@contextmanager
+def scratch_database(name=None):
+    """
+    Run the benchmark on a new test database, so the seeded rows never
+    reach the configured database. The test database is named name when
+    given, which for SQLite is a file instead of the shared memory.
+    """
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    if name is not None:
+        test_settings['NAME'] = name
+    try:
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+    finally:
+        test_settings['NAME'] = old_test_name
+
+
+@contextmanager
+def unthrottled():
+    """
+    Keep the throttles running with rates high enough to never reject a
+    request, and their token buckets in memory instead of the shared file.
+    """
+    rates = dict(
+        (scope, '1000000000/second')
+        for scope in SimpleRateThrottle.THROTTLE_RATES)
+    with override_settings(GAMES_THROTTLE_DATABASE=':memory:'), \
+            mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, rates):
+        yield
+
+
+def seed_scores(games_count, players_count, scores_count,
+                batch_size=5000, seed=0, users_count=1, categories_count=1):
+    """
+    Create the requested number of users, game categories, games,
+    players and scores with bulk_create, building batch_size scores
+    at a time. Games are spread evenly among the owners and categories.
+    No signals are sent.
+    """
+    generator = random.Random(seed)
+    now = timezone.now()
+    owners = [
+        User.objects.create_user(
+            'benchmark{0}'.format(number),
+            'benchmark{0}@example.com'.format(number))
+        for number in range(max(users_count, 1))]
+    game_categories = [
+        GameCategory.objects.create(name='Benchmark {0}'.format(number))
+        for number in range(max(categories_count, 1))]
+    Game.objects.bulk_create([
+        Game(
+            owner=owners[number % len(owners)],
+            name='Game {0}'.format(number),
+            game_category=game_categories[number % len(game_categories)],
+            release_date=now - timedelta(days=number),
+            played=number % 2 == 0)
+        for number in range(games_count)])
+    Player.objects.bulk_create([
+        Player(name='Player {0}'.format(number))
+        for number in range(players_count)])
+    game_ids = list(Game.objects.values_list('pk', flat=True))
+    player_ids = list(Player.objects.values_list('pk', flat=True))
+    for batch_start in range(0, scores_count, batch_size):
+        batch_end = min(batch_start + batch_size, scores_count)
+        PlayerScore.objects.bulk_create([
+            PlayerScore(
+                player_id=generator.choice(player_ids),
+                game_id=generator.choice(game_ids),
+                score=generator.randint(0, 100000),
+                score_date=now - timedelta(minutes=number))
+            for number in range(batch_start, batch_end)])
+
+
+def time_view(view, path, repeat, headers=None, **kwargs):
+    """
+    Call a view with GET requests for the path and return the
+    duration of each call in milliseconds.
+    """
+    factory = APIRequestFactory()
+    durations = []
+    for number in range(repeat):
+        request = factory.get(path, **(headers or {}))
+        start = time.perf_counter()
+        response = view(request, **kwargs)
+        response.render()
+        durations.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+    return durations
+
+
+def time_function(function, repeat):
+    """
+    Call a function repeatedly and return the duration of each call
+    in milliseconds.
+    """
+    durations = []
+    for number in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def capture_view_queries(view, path, headers=None, **kwargs):
+    """
+    Call a view with a GET request for the path and return the SQL of
+    the queries it ran, with the parameters interpolated.
+    """
+    request = APIRequestFactory().get(path, **(headers or {}))
+    with CaptureQueriesContext(connection) as context:
+        response = view(request, **kwargs)
+        response.render()
+    assert response.status_code == 200, response.status_code
+    return [query['sql'] for query in context.captured_queries]
+
+
+def explain(sql):
+    """
+    Return the lines of the plan the database chooses for a query.
+    """
+    if connection.vendor == 'sqlite':
+        statement = 'EXPLAIN QUERY PLAN ' + sql
+    else:
+        statement = 'EXPLAIN ' + sql
+    with connection.cursor() as cursor:
+        cursor.execute(statement)
+        # The readable detail is the last column on every backend
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def format_durations(label, durations):
+    durations = sorted(durations)
+    return '{0:<40} median {1:8.3f} ms  min {2:8.3f} ms  max {3:8.3f} ms'.format(
+        label,
+        durations[len(durations) // 2],
+        durations[0],
+        durations[-1])
+
+
+def format_requests_per_second(label, durations):
+    return '{0:<40} {1:10.1f} requests/s'.format(
+        label,
+        len(durations) * 1000 / sum(durations))
@@ -0,0 +1,146 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import math
+import threading
+import time
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from games import urls
+from games.models import Game
+
+
+# Models of the primary keys in the routes whose view lists other rows
+ROUTE_PK_MODELS = {
+    'game-leaderboard': Game,
+}
+
+
+def get_routes():
+    """
+    Return the name and path of every route in games.urls that answers
+    GET requests, with the primary key of the first row of its model in
+    the routes that take one.
+    """
+    routes = []
+    for pattern in urls.urlpatterns:
+        view_class = getattr(pattern.callback, 'view_class', None)
+        if view_class is None or not hasattr(view_class, 'get'):
+            continue
+        kwargs = {}
+        if 'pk' in pattern.regex.groupindex:
+            model = ROUTE_PK_MODELS.get(
+                pattern.name, getattr(view_class.queryset, 'model', None))
+            kwargs['pk'] = model.objects.order_by(
+                'pk').values_list('pk', flat=True).first()
+        routes.append((pattern.name, reverse(pattern.name, kwargs=kwargs)))
+    return routes
+
+
+def percentile(values, fraction):
+    """
+    Return the nearest rank percentile of the values, fraction being
+    between 0 and 1.
+    """
+    values = sorted(values)
+    index = int(math.ceil(fraction * len(values))) - 1
+    return values[max(index, 0)]
+
+
+def drive(path, requests_count, concurrency, headers=None):
+    """
+    Send requests_count GET requests for the path from concurrency
+    threads, each with its own test client and database connection.
+    Return the duration of each request in milliseconds, the number of
+    queries each one ran, the status codes that weren't 200 and the
+    elapsed seconds.
+    """
+    lock = threading.Lock()
+    pending = iter(range(requests_count))
+    durations = []
+    query_counts = []
+    failures = []
+
+    def worker():
+        client = Client()
+        try:
+            while True:
+                with lock:
+                    if next(pending, None) is None:
+                        return
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    response = client.get(path, **(headers or {}))
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    duration = (time.perf_counter() - start) * 1000
+                with lock:
+                    durations.append(duration)
+                    query_counts.append(len(context.captured_queries))
+                    if response.status_code != 200:
+                        failures.append(response.status_code)
+        finally:
+            # Each thread opened its own connection
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for number in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return durations, query_counts, failures, time.perf_counter() - start
+
+
+def summarize(path, durations, query_counts, failures, elapsed):
+    return {
+        'path': path,
+        'requests': len(durations),
+        'failures': len(failures),
+        'p50_ms': round(percentile(durations, 0.50), 3),
+        'p95_ms': round(percentile(durations, 0.95), 3),
+        'p99_ms': round(percentile(durations, 0.99), 3),
+        'requests_per_second': round(len(durations) / elapsed, 1),
+        'queries_per_request': round(sum(query_counts) / len(query_counts), 2),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return a description of every regression of the results against
+    the baseline: a route that fails requests, a p95 latency above the
+    baseline by more than the tolerance fraction, fewer requests per
+    second by more than the tolerance fraction, or more queries per
+    request. Routes missing from either one are ignored.
+    """
+    regressions = []
+    for name, expected in sorted(baseline['routes'].items()):
+        actual = results['routes'].get(name)
+        if actual is None:
+            continue
+        if actual['failures']:
+            regressions.append('{0}: {1} failed requests'.format(
+                name, actual['failures']))
+        if actual['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+            regressions.append('{0}: p95 {1} ms, baseline {2} ms'.format(
+                name, actual['p95_ms'], expected['p95_ms']))
+        if (actual['requests_per_second'] <
+                expected['requests_per_second'] / (1 + tolerance)):
+            regressions.append(
+                '{0}: {1} requests/s, baseline {2} requests/s'.format(
+                    name,
+                    actual['requests_per_second'],
+                    expected['requests_per_second']))
+        # Query counts don't depend on the host, any increase is a regression
+        if actual['queries_per_request'] > expected['queries_per_request']:
+            regressions.append(
+                '{0}: {1} queries/request, baseline {2} queries/request'.format(
+                    name,
+                    actual['queries_per_request'],
+                    expected['queries_per_request']))
+    return regressions
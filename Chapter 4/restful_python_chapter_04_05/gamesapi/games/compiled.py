@@ -0,0 +1,275 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import inspect
+from collections import OrderedDict
+from operator import attrgetter
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models
+from rest_framework import serializers
+from rest_framework.fields import Field
+from rest_framework.fields import ISO_8601
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.relations import RelatedField
+from rest_framework.settings import api_settings
+
+
+# Representations inlined instead of calling to_representation,
+# only for fields of exactly these classes
+INLINE_REPRESENTATIONS = {
+    serializers.ReadOnlyField: '{0}',
+    serializers.CharField: 'str({0})',
+    serializers.IntegerField: 'int({0})',
+}
+
+
+def represent_iso_8601(value):
+    # DateTimeField.to_representation for the ISO 8601 format
+    if not value:
+        return None
+    if isinstance(value, str):
+        return value
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def get_representation_function(field):
+    """
+    Return a function equivalent to the to_representation method of a
+    bound field that avoids its attribute lookups when possible.
+    """
+    if hasattr(field, 'get_representation_function'):
+        return field.get_representation_function()
+    if type(field) is serializers.SlugRelatedField:
+        return attrgetter(field.slug_field)
+    if type(field) is serializers.DateTimeField:
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if output_format is not None and output_format.lower() == ISO_8601:
+            return represent_iso_8601
+    return field.to_representation
+
+
+def get_readable_fields(serializer):
+    return [
+        field for field in serializer.fields.values()
+        if not field.write_only]
+
+
+def has_plain_get_attribute(field):
+    get_attribute = type(field).get_attribute
+    if get_attribute is RelatedField.get_attribute:
+        return not field.use_pk_only_optimization()
+    return get_attribute is Field.get_attribute
+
+
+def is_simple_method(model, attr):
+    # Methods that get_attribute calls because they take no arguments
+    function = getattr(model, attr, None)
+    if not inspect.isfunction(function):
+        return False
+    spec = inspect.getfullargspec(function)
+    return len(spec.args) - 1 <= len(spec.defaults or ())
+
+
+def get_model_fields(model, source_attrs):
+    """
+    Return the model field for each attribute of a dotted source, None
+    for a last attribute that is a method without arguments, or None
+    instead of the list if an attribute is something else or follows a
+    to-many relation before the last one.
+    """
+    model_fields = []
+    for index, attr in enumerate(source_attrs):
+        if model is None:
+            return None
+        is_last = index == len(source_attrs) - 1
+        try:
+            if attr == 'pk':
+                model_field = model._meta.pk
+            else:
+                model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            if is_last and is_simple_method(model, attr):
+                model_fields.append(None)
+                return model_fields
+            return None
+        if model_field.is_relation and not is_last:
+            if not (model_field.many_to_one or model_field.one_to_one):
+                return None
+            if not model_field.concrete:
+                return None
+        model_fields.append(model_field)
+        model = model_field.related_model
+    return model_fields
+
+
+class RowFunctionCompiler(object):
+    """
+    Generates the source of a function that returns the same ordered
+    dict as Serializer.to_representation for the fields of a serializer.
+    Attributes that are model fields are read directly, nested
+    serializers are compiled in turn and any other field goes through
+    its own get_attribute and to_representation.
+    """
+    def __init__(self, serializer):
+        self.serializer = serializer
+        meta = getattr(serializer, 'Meta', None)
+        self.model = getattr(meta, 'model', None)
+        self.lines = [
+            'def represent(instance):',
+            '    ret = OrderedDict()',
+            ]
+
+    def emit(self, *lines):
+        self.lines.extend('    ' + line for line in lines)
+
+    def get_representation(self, index, field, value):
+        if isinstance(field, serializers.ListSerializer):
+            if type(field).to_representation is serializers.ListSerializer.to_representation:
+                return (
+                    '[s{0}(item) for item in ({1}.all() '
+                    'if isinstance({1}, Manager) else {1})]'.format(index, value))
+        elif isinstance(field, serializers.BaseSerializer):
+            return 's{0}({1})'.format(index, value)
+        template = INLINE_REPRESENTATIONS.get(type(field))
+        if template is not None:
+            return template.format(value)
+        return 'f{0}({1})'.format(index, value)
+
+    def compile_field(self, index, field):
+        name = repr(field.field_name)
+        if has_plain_get_attribute(field):
+            if field.source == '*':
+                self.emit('ret[{0}] = {1}'.format(
+                    name, self.get_representation(index, field, 'instance')))
+                return
+            model_fields = get_model_fields(self.model, field.source_attrs)
+            if model_fields is not None:
+                self.compile_attributes(index, field, model_fields)
+                return
+        elif (isinstance(field, RelatedField) and
+                len(field.source_attrs) == 1):
+            model_fields = get_model_fields(self.model, field.source_attrs)
+            if (model_fields is not None and model_fields[0] is not None and
+                    model_fields[0].concrete):
+                # Primary key only related fields read the foreign key column
+                self.emit(
+                    'value = instance.{0}'.format(model_fields[0].attname),
+                    'ret[{0}] = None if value is None else '
+                    'f{1}(PKOnlyObject(pk=value))'.format(name, index))
+                return
+        self.emit(
+            'try:',
+            '    value = g{0}(instance)'.format(index),
+            'except SkipField:',
+            '    pass',
+            'else:',
+            '    ret[{0}] = None if (value.pk if isinstance(value, PKOnlyObject) '
+            'else value) is None else f{1}(value)'.format(name, index))
+
+    def compile_attributes(self, index, field, model_fields):
+        name = repr(field.field_name)
+        follows_relation = any(
+            model_field is not None and model_field.is_relation
+            for model_field in model_fields)
+        lines = []
+        for position, (attr, model_field) in enumerate(
+                zip(field.source_attrs, model_fields)):
+            owner = 'instance' if position == 0 else 'value'
+            call = '()' if model_field is None else ''
+            line = 'value = {0}.{1}{2}'.format(owner, attr, call)
+            if position == 0:
+                lines.append(line)
+            else:
+                lines.extend(['if value is not None:', '    ' + line])
+        if follows_relation:
+            # A missing related row is represented as None
+            self.emit('try:')
+            self.emit(*['    ' + line for line in lines])
+            self.emit('except ObjectDoesNotExist:', '    value = None')
+        else:
+            self.emit(*lines)
+        self.emit('ret[{0}] = None if value is None else {1}'.format(
+            name, self.get_representation(index, field, 'value')))
+
+    def compile(self):
+        for index, field in enumerate(get_readable_fields(self.serializer)):
+            self.compile_field(index, field)
+        self.emit('return ret')
+        return compile(
+            '\n'.join(self.lines) + '\n',
+            '<compiled {0}>'.format(type(self.serializer).__name__),
+            'exec')
+
+
+_compiled_code = {}
+
+
+def get_row_function(serializer):
+    """
+    Return a function that represents an instance like the
+    to_representation method of the serializer. The source is generated
+    and compiled once for each serializer class and set of fields, and
+    bound to the fields of every serializer instance.
+    """
+    fields = get_readable_fields(serializer)
+    key = (type(serializer), tuple(
+        (field.field_name, type(field)) for field in fields))
+    code = _compiled_code.get(key)
+    if code is None:
+        code = RowFunctionCompiler(serializer).compile()
+        _compiled_code[key] = code
+    namespace = {
+        'OrderedDict': OrderedDict,
+        'Manager': models.Manager,
+        'ObjectDoesNotExist': ObjectDoesNotExist,
+        'PKOnlyObject': PKOnlyObject,
+        'SkipField': SkipField,
+        }
+    for index, field in enumerate(fields):
+        namespace['f{0}'.format(index)] = get_representation_function(field)
+        namespace['g{0}'.format(index)] = field.get_attribute
+        if isinstance(field, serializers.ListSerializer):
+            namespace['s{0}'.format(index)] = get_child_function(field.child)
+        elif isinstance(field, serializers.BaseSerializer):
+            namespace['s{0}'.format(index)] = get_child_function(field)
+    exec(code, namespace)
+    return namespace['represent']
+
+
+def get_child_function(serializer):
+    if isinstance(serializer, CompiledRepresentationMixin):
+        return serializer.get_row_function()
+    if type(serializer).to_representation is serializers.Serializer.to_representation:
+        return get_row_function(serializer)
+    return serializer.to_representation
+
+
+class CompiledRepresentationMixin(object):
+    """
+    Serializer mixin that represents instances with a generated function
+    instead of walking the fields for every row. Validation and saving
+    are unchanged. GAMES_COMPILED_SERIALIZERS = False restores the
+    regular representation.
+    """
+    def get_row_function(self):
+        row_function = self.__dict__.get('_row_function')
+        if row_function is None:
+            if getattr(settings, 'GAMES_COMPILED_SERIALIZERS', True):
+                row_function = get_row_function(self)
+            else:
+                row_function = super(
+                    CompiledRepresentationMixin, self).to_representation
+            self._row_function = row_function
+        return row_function
+
+    def to_representation(self, instance):
+        return self.get_row_function()(instance)
@@ -0,0 +1,88 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import hashlib
+from calendar import timegm
+from django.db import IntegrityError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.http import quote_etag
+from games.models import ModelVersion
+from games.queryplanner import get_query_plan
+
+
+def bump_model_version(model):
+    """
+    Record that rows of the model changed. The post_save and post_delete
+    receivers call it, code that bypasses signals has to call it too.
+    """
+    label = model._meta.label_lower
+    now = timezone.now()
+    versions = ModelVersion.objects.filter(label=label)
+    if versions.update(version=F('version') + 1, modified=now):
+        return
+    try:
+        with transaction.atomic():
+            ModelVersion.objects.create(label=label, version=1, modified=now)
+    except IntegrityError:
+        # Another request created the row first
+        versions.update(version=F('version') + 1, modified=now)
+
+
+def get_model_versions(models):
+    """
+    Return the version of each model and the last time any of them
+    changed, with a single query.
+    """
+    labels = [model._meta.label_lower for model in models]
+    rows = dict(
+        (label, (version, modified))
+        for label, version, modified in ModelVersion.objects.filter(
+            label__in=labels).values_list('label', 'version', 'modified'))
+    versions = [rows.get(label, (0, None))[0] for label in labels]
+    modified = [
+        rows[label][1] for label in labels if label in rows]
+    return versions, max(modified) if modified else None
+
+
+class ConditionalGetMixin(object):
+    """
+    Generic view mixin that adds a strong ETag and a Last-Modified header
+    to GET responses. Both come from the versions of the models the
+    serializer reads, so an If-None-Match or If-Modified-Since hit is
+    answered with 304 Not Modified before the queryset is evaluated.
+    """
+    def get_validators(self, request):
+        models = get_query_plan(self.get_serializer_class()).models
+        versions, modified = get_model_versions(models)
+        # Also used by the pagination to key its cached counts
+        self.model_versions = (versions, modified)
+        # The browsable API shows the user, so it is part of the tag
+        values = [
+            request.get_full_path(),
+            request.accepted_media_type,
+            request.user.pk,
+            ] + versions
+        etag = hashlib.sha1(
+            '|'.join(str(value) for value in values).encode('utf-8'))
+        last_modified = timegm(modified.utctimetuple()) if modified else None
+        return etag.hexdigest(), last_modified
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super(ConditionalGetMixin, self).get(
+                request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = quote_etag(etag)
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -0,0 +1,39 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from django.conf import settings
+
+
+def get_export_chunk_size():
+    return getattr(settings, 'GAMES_EXPORT_CHUNK_SIZE', 1000)
+
+
+def iterate_rows(queryset, fields, converters=None):
+    """
+    Yield the values of the fields for every row of the queryset in
+    primary key order. Each chunk is retrieved with its own query that
+    seeks past the last primary key, so no more than one chunk of rows is
+    held in memory, whatever the database driver does with a cursor.
+    converters maps a field name to a function applied to its values.
+    """
+    chunk_size = get_export_chunk_size()
+    converters = converters or {}
+    convert = [converters.get(field) for field in fields]
+    # The primary key is retrieved last to seek the next chunk
+    queryset = queryset.order_by('pk').values_list(*(list(fields) + ['pk']))
+    last_pk = None
+    while True:
+        chunk = queryset
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        for row in rows:
+            yield tuple(
+                value if function is None or value is None else function(value)
+                for function, value in zip(convert, row))
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][-1]
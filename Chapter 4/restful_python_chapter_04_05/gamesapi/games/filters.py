@@ -0,0 +1,84 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from django import forms
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.constants import LOOKUP_SEP
+from django_filters import Filter
+from django_filters.filters import EMPTY_VALUES
+from games.conditional import get_model_versions
+
+
+def get_name_choices_cache_key(model):
+    # The version changes with every write to the model in any process
+    versions, modified = get_model_versions([model])
+    return 'games:name-choices:{0}:{1}'.format(
+        model._meta.label_lower, versions[0])
+
+
+def get_name_choices(model):
+    """
+    Return the first names of a model in alphabetical order. The list is
+    bounded by GAMES_NAME_CHOICES_LIMIT and cached until a row changes.
+    """
+    cache_key = get_name_choices_cache_key(model)
+    names = cache.get(cache_key)
+    if names is None:
+        limit = getattr(settings, 'GAMES_NAME_CHOICES_LIMIT', 100)
+        names = list(model._default_manager.order_by(
+            'name').values_list('name', flat=True)[:limit])
+        cache.set(
+            cache_key,
+            names,
+            getattr(settings, 'GAMES_NAME_CHOICES_TIMEOUT', 300))
+    return names
+
+
+class NameSelect(forms.Select):
+    """
+    A select widget that only retrieves its name choices when the
+    browsable API renders it.
+    """
+    def __init__(self, model, attrs=None):
+        super(NameSelect, self).__init__(attrs)
+        self.model = model
+
+    def render(self, *args, **kwargs):
+        self.choices = [('', '---------')] + [
+            (name, name) for name in get_name_choices(self.model)]
+        return super(NameSelect, self).render(*args, **kwargs)
+
+
+class RelatedNameFilter(Filter):
+    """
+    Filters on the unique name of a related model, such as player__name.
+    The name is resolved to a primary key with an indexed lookup and the
+    queryset is filtered on the foreign key, without joining the names.
+    """
+    field_class = forms.CharField
+
+    def get_related(self):
+        relation_name, field_name = self.name.split(LOOKUP_SEP, 1)
+        related_model = self.model._meta.get_field(relation_name).related_model
+        return relation_name, related_model, field_name
+
+    @property
+    def field(self):
+        if self.widget is None:
+            relation_name, related_model, field_name = self.get_related()
+            self.widget = NameSelect(related_model)
+        return super(RelatedNameFilter, self).field
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        relation_name, related_model, field_name = self.get_related()
+        pk = related_model._default_manager.filter(
+            **{field_name: value}).values_list('pk', flat=True).first()
+        if pk is None:
+            return qs.none()
+        return self.get_method(qs)(**{relation_name: pk})
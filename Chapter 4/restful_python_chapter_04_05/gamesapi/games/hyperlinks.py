@@ -0,0 +1,94 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from django.core.urlresolvers import NoReverseMatch
+from django.utils import six
+from rest_framework import serializers
+from rest_framework.relations import Hyperlink
+
+
+class HyperlinkTemplateMixin(object):
+    """
+    Hyperlinked field mixin that reverses each view name once per request
+    with a placeholder primary key, and then builds the URL of every row
+    by replacing the placeholder with its primary key. Lookup values that
+    aren't integers and URLs that the placeholder doesn't split in two
+    fall back to reversing the URL for each row.
+    """
+    # Reversed in place of the primary key, digits match the pk patterns
+    placeholder = '7301948265'
+
+    def get_url_template(self, view_name, request, format):
+        templates = getattr(request, '_hyperlink_templates', None)
+        if templates is None:
+            templates = {}
+            request._hyperlink_templates = templates
+        key = (view_name, self.lookup_url_kwarg, format)
+        if key not in templates:
+            try:
+                url = self.reverse(
+                    view_name,
+                    kwargs={self.lookup_url_kwarg: self.placeholder},
+                    request=request,
+                    format=format)
+            except NoReverseMatch:
+                url = ''
+            parts = url.split(self.placeholder)
+            templates[key] = parts if len(parts) == 2 else None
+        return templates[key]
+
+    def get_url(self, obj, view_name, request, format):
+        # Unsaved objects will not yet have a valid URL.
+        if hasattr(obj, 'pk') and obj.pk in (None, ''):
+            return None
+        lookup_value = getattr(obj, self.lookup_field)
+        if request is not None and isinstance(lookup_value, six.integer_types):
+            template = self.get_url_template(view_name, request, format)
+            if template is not None:
+                return template[0] + str(lookup_value) + template[1]
+        return super(HyperlinkTemplateMixin, self).get_url(
+            obj, view_name, request, format)
+
+    def get_representation_function(self):
+        """
+        Return a function equivalent to to_representation for the
+        serializer context, which builds the hyperlink from the template
+        without any method call.
+        """
+        request = self.context.get('request', None)
+        format = self.context.get('format', None)
+        if format and self.format and self.format != format:
+            format = self.format
+        if request is None or self.lookup_field != 'pk':
+            return self.to_representation
+        template = self.get_url_template(self.view_name, request, format)
+        if template is None:
+            return self.to_representation
+        prefix, suffix = template
+        to_representation = self.to_representation
+
+        def represent(obj):
+            pk = obj.pk
+            if not isinstance(pk, six.integer_types):
+                return to_representation(obj)
+            return Hyperlink(prefix + str(pk) + suffix, six.text_type(obj))
+        return represent
+
+
+class TemplatedHyperlinkedRelatedField(HyperlinkTemplateMixin,
+                                       serializers.HyperlinkedRelatedField):
+    pass
+
+
+class TemplatedHyperlinkedIdentityField(HyperlinkTemplateMixin,
+                                        serializers.HyperlinkedIdentityField):
+    pass
+
+
+class TemplatedHyperlinkedModelSerializer(
+        serializers.HyperlinkedModelSerializer):
+    serializer_related_field = TemplatedHyperlinkedRelatedField
+    serializer_url_field = TemplatedHyperlinkedIdentityField
@@ -0,0 +1,109 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from django.conf import settings
+from django.db import transaction
+from games.conditional import bump_model_version
+from games.models import Game
+from games.models import LeaderboardEntry
+from games.models import PlayerScore
+
+
+def get_leaderboard_size():
+    return getattr(settings, 'GAMES_LEADERBOARD_SIZE', 10)
+
+
+def get_top_player_scores(game_id):
+    # The (game, score) index answers this query reading only the top rows
+    return PlayerScore.objects.filter(
+        game_id=game_id).order_by('-score', 'pk')[:get_leaderboard_size()]
+
+
+def refresh_game_leaderboard(game_id):
+    """
+    Make the leaderboard entries for a game match its current top scores.
+    """
+    top_scores = dict(
+        get_top_player_scores(game_id).values_list('pk', 'score'))
+    entries = LeaderboardEntry.objects.filter(game_id=game_id)
+    entries.exclude(player_score_id__in=top_scores.keys()).delete()
+    current_scores = dict(entries.values_list('player_score_id', 'score'))
+    for player_score_id, score in top_scores.items():
+        if player_score_id not in current_scores:
+            LeaderboardEntry.objects.create(
+                game_id=game_id,
+                player_score_id=player_score_id,
+                score=score)
+        elif current_scores[player_score_id] != score:
+            entries.filter(
+                player_score_id=player_score_id).update(score=score)
+
+
+def add_player_score(player_score):
+    """
+    Add a player score to its game leaderboard if it ranks in the top
+    scores. Only the current entries are read, never the scores table.
+    """
+    size = get_leaderboard_size()
+    entries = list(LeaderboardEntry.objects.filter(
+        game_id=player_score.game_id).values_list('score', 'player_score_id'))
+    if len(entries) >= size:
+        lowest_score, lowest_player_score_id = entries[size - 1]
+        if ((player_score.score, -player_score.pk) <
+                (lowest_score, -lowest_player_score_id)):
+            return
+        LeaderboardEntry.objects.filter(player_score_id__in=[
+            player_score_id
+            for score, player_score_id in entries[size - 1:]]).delete()
+    LeaderboardEntry.objects.create(
+        game_id=player_score.game_id,
+        player_score=player_score,
+        score=player_score.score)
+
+
+def update_player_score(player_score):
+    """
+    Update the leaderboards after an existing player score changed.
+    """
+    try:
+        entry = LeaderboardEntry.objects.get(player_score=player_score)
+    except LeaderboardEntry.DoesNotExist:
+        # A score that wasn't on the leaderboard can only move up
+        add_player_score(player_score)
+        return
+    # The score may have dropped below another one or moved to a new game
+    refresh_game_leaderboard(entry.game_id)
+    if entry.game_id != player_score.game_id:
+        add_player_score(player_score)
+
+
+def remove_player_score(player_score):
+    """
+    Refill the game leaderboard after a player score was deleted.
+    Its entry was deleted with it, so a missing entry means a free slot.
+    """
+    entries_count = LeaderboardEntry.objects.filter(
+        game_id=player_score.game_id).count()
+    if entries_count < get_leaderboard_size():
+        refresh_game_leaderboard(player_score.game_id)
+
+
+@transaction.atomic
+def rebuild_leaderboards():
+    """
+    Rebuild the leaderboard entries for every game from the scores table.
+    """
+    LeaderboardEntry.objects.all().delete()
+    for game_id in Game.objects.values_list('pk', flat=True).iterator():
+        LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(
+                game_id=game_id,
+                player_score_id=player_score_id,
+                score=score)
+            for player_score_id, score
+            in get_top_player_scores(game_id).values_list('pk', 'score')])
+    # Entries have no receivers, they usually change with the scores
+    bump_model_version(LeaderboardEntry)
@@ -0,0 +1,76 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import json
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from games import benchmarks
+from games.benchmarks import load
+from games.leaderboards import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = ('Seeds a scratch database and sends concurrent GET requests to '
+            'every route of the games API, reporting the latency '
+            'percentiles, requests per second and queries per request. '
+            'With --baseline, fails if any route regressed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--games', type=int, default=1000)
+        parser.add_argument('--players', type=int, default=1000)
+        parser.add_argument('--scores', type=int, default=20000)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', help='File to write the results to as JSON')
+        parser.add_argument(
+            '--baseline', help='JSON results to compare the results with')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Fraction a latency or throughput may be worse than '
+                 'the baseline')
+
+    def handle(self, *args, **options):
+        results = {
+            'settings': dict(
+                (key, options[key]) for key in (
+                    'users', 'categories', 'games', 'players', 'scores',
+                    'requests', 'concurrency', 'seed')),
+            'routes': {},
+        }
+        with benchmarks.scratch_database(), benchmarks.unthrottled():
+            benchmarks.seed_scores(
+                options['games'], options['players'], options['scores'],
+                seed=options['seed'],
+                users_count=options['users'],
+                categories_count=options['categories'])
+            rebuild_leaderboards()
+            for name, path in load.get_routes():
+                # Warm the caches and compiled serializers first
+                load.drive(path, options['concurrency'], options['concurrency'])
+                summary = load.summarize(path, *load.drive(
+                    path, options['requests'], options['concurrency']))
+                results['routes'][name] = summary
+                self.stdout.write(
+                    '{0:<40} p50 {p50_ms:8.3f} ms  p95 {p95_ms:8.3f} ms  '
+                    'p99 {p99_ms:8.3f} ms  {requests_per_second:8.1f} '
+                    'requests/s  {queries_per_request:5.2f} queries'.format(
+                        path, **summary))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = load.compare(
+                    results, json.load(baseline), options['tolerance'])
+            if regressions:
+                raise CommandError(
+                    'Performance regressions against the baseline:\n' +
+                    '\n'.join(regressions))
+            self.stdout.write('No regressions against the baseline.')
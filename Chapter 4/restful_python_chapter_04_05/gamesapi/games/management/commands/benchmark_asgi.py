@@ -0,0 +1,159 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import asyncio
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from games import benchmarks
+from games.asgi import ASGIHandler
+from games.asgi import get_environ
+
+
+class InFlightTracker(object):
+    """
+    Counts the requests being served and the most served at once.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.peak_threads = threading.active_count()
+
+    def start(self):
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.peak_threads = max(
+                self.peak_threads, threading.active_count())
+
+    def finish(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+def get_scope(path):
+    return {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'root_path': '',
+        'query_string': b'',
+        'headers': [(b'accept', b'application/json')],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 0),
+    }
+
+
+def serve_asgi(path, clients, threads, delay, tracker):
+    """
+    Serve the requests of clients that take delay seconds to receive
+    each response with the ASGI handler.
+    """
+    application = ASGIHandler(get_wsgi_application(), threads=threads)
+
+    async def slow_client():
+        messages = [{'type': 'http.request', 'body': b''}]
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                assert message['status'] == 200, message['status']
+            elif not message.get('more_body', False):
+                await asyncio.sleep(delay)
+
+        tracker.start()
+        try:
+            await application(get_scope(path), receive, send)
+        finally:
+            tracker.finish()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(asyncio.gather(
+            *[slow_client() for number in range(clients)], loop=loop))
+    finally:
+        application.get_executor().shutdown(wait=True)
+        loop.close()
+
+
+def serve_wsgi(path, clients, threads, delay, tracker):
+    """
+    Serve the same clients like a threaded WSGI server, where each
+    request holds its thread until the client received the response.
+    """
+    application = get_wsgi_application()
+
+    def slow_client():
+        tracker.start()
+        try:
+            status = []
+            iterable = application(
+                get_environ(get_scope(path), b''),
+                lambda response_status, headers, exc_info=None:
+                    status.append(response_status))
+            try:
+                b''.join(iterable)
+                assert status[0].startswith('200'), status[0]
+                time.sleep(delay)
+            finally:
+                iterable.close()
+        finally:
+            tracker.finish()
+
+    with ThreadPoolExecutor(threads) as executor:
+        for future in [executor.submit(slow_client) for number in range(clients)]:
+            future.result()
+
+
+class Command(BaseCommand):
+    help = ('Compares how many slow clients the ASGI handler and a threaded '
+            'WSGI deployment serve at once, and the memory each request in '
+            'flight takes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/games/')
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=10)
+        parser.add_argument(
+            '--delay', type=float, default=0.2,
+            help='Seconds each client takes to receive a response')
+
+    def handle(self, *args, **options):
+        with benchmarks.scratch_database(), benchmarks.unthrottled():
+            benchmarks.seed_scores(100, 100, 1000)
+            for label, serve in (('WSGI', serve_wsgi), ('ASGI', serve_asgi)):
+                tracker = InFlightTracker()
+                tracemalloc.start()
+                start = time.perf_counter()
+                serve(
+                    options['path'],
+                    options['clients'],
+                    options['threads'],
+                    options['delay'],
+                    tracker)
+                elapsed = time.perf_counter() - start
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.stdout.write(
+                    '{0} {1:8.2f} s  {2:8.1f} requests/s  {3:5} in flight  '
+                    '{4:4} threads  {5:8.1f} KiB per request in flight'.format(
+                        label,
+                        elapsed,
+                        options['clients'] / elapsed,
+                        tracker.peak_in_flight,
+                        tracker.peak_threads,
+                        peak / 1024 / tracker.peak_in_flight))
+        self.stdout.write(
+            'Memory is the peak traced by tracemalloc, which leaves out the '
+            'stack of each thread.')
@@ -0,0 +1,38 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import base64
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.authentication import BasicAuthentication
+from games import benchmarks
+from games import views
+from games.authentication import CachedBasicAuthentication
+
+
+class Command(BaseCommand):
+    help = ('Compares the requests per second of the games list with basic '
+            'authentication and cached basic authentication.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with benchmarks.scratch_database(), benchmarks.unthrottled():
+            User.objects.create_user(
+                'benchmark-user', 'benchmark-user@example.com', 'password')
+            credentials = base64.b64encode(
+                b'benchmark-user:password').decode('ascii')
+            headers = {'HTTP_AUTHORIZATION': 'Basic ' + credentials}
+            for label, authentication_class in (
+                    ('BasicAuthentication', BasicAuthentication),
+                    ('CachedBasicAuthentication', CachedBasicAuthentication)):
+                view = views.GameList.as_view(
+                    authentication_classes=(authentication_class,))
+                self.stdout.write(benchmarks.format_requests_per_second(
+                    label,
+                    benchmarks.time_view(
+                        view, '/games/', options['repeat'], headers=headers)))
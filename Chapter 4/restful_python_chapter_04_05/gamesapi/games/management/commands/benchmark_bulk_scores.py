@@ -0,0 +1,56 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import random
+import time
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+from games import benchmarks
+from games import views
+from games.models import PlayerScore
+
+
+class Command(BaseCommand):
+    help = ('Compares the scores per second ingested by posting each score '
+            'to the player scores list and by posting them in bulk.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scores', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        generator = random.Random(0)
+        player_scores = [
+            {
+                'player': 'Player {0}'.format(generator.randrange(1000)),
+                'game': 'Game {0}'.format(generator.randrange(100)),
+                'score': generator.randint(0, 100000),
+                'score_date': '2016-09-01T10:00:00Z',
+            }
+            for number in range(options['scores'])]
+        factory = APIRequestFactory()
+        with benchmarks.scratch_database(), benchmarks.unthrottled():
+            benchmarks.seed_scores(100, 1000, 0)
+            view = views.PlayerScoreList.as_view()
+            start = time.perf_counter()
+            for player_score in player_scores:
+                response = view(factory.post(
+                    '/player-scores/', player_score, format='json'))
+                assert response.status_code == 201, response.data
+            self.write_scores_per_second(
+                'PlayerScoreList', len(player_scores), start)
+            PlayerScore.objects.all().delete()
+            view = views.PlayerScoreBulkCreate.as_view()
+            start = time.perf_counter()
+            response = view(factory.post(
+                '/player-scores/bulk/', player_scores, format='json'))
+            assert response.status_code == 201, response.data
+            self.write_scores_per_second(
+                'PlayerScoreBulkCreate', len(player_scores), start)
+
+    def write_scores_per_second(self, label, count, start):
+        self.stdout.write('{0:<40} {1:10.1f} scores/s'.format(
+            label,
+            count / (time.perf_counter() - start)))
@@ -0,0 +1,99 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.http import urlencode
+from games import benchmarks
+from games import views
+from games.models import Game
+from games.models import GameCategory
+from games.models import Player
+
+
+def get_cases():
+    """
+    Return the (view, path, table) for each filter and ordering
+    combination the games API runs.
+    """
+    # The filter form parses dates without the ISO 8601 T separator
+    # in the current time zone
+    date_format = '%Y-%m-%d %H:%M:%S.%f'
+    now = timezone.localtime(timezone.now())
+    game = Game.objects.first()
+    player = Player.objects.first()
+    game_category = GameCategory.objects.first()
+    player_scores = '/player-scores/?{0}'
+    games = '/games/?{0}'
+    return [
+        (views.PlayerScoreList, player_scores.format(''),
+         'games_playerscore'),
+        (views.PlayerScoreList, player_scores.format(urlencode({
+            'min_score': 90000, 'max_score': 95000})),
+         'games_playerscore'),
+        (views.PlayerScoreList, player_scores.format(urlencode({
+            'from_score_date': (now - timedelta(hours=2)).strftime(date_format),
+            'to_score_date': (now - timedelta(hours=1)).strftime(date_format),
+            'ordering': '-score_date'})),
+         'games_playerscore'),
+        (views.PlayerScoreList, player_scores.format(urlencode({
+            'player_name': player.name})),
+         'games_playerscore'),
+        (views.PlayerScoreList, player_scores.format(urlencode({
+            'game_name': game.name})),
+         'games_playerscore'),
+        (views.GameList, games.format(urlencode({
+            'ordering': 'release_date'})),
+         'games_game'),
+        (views.GameList, games.format(urlencode({
+            'played': 'True', 'ordering': '-release_date'})),
+         'games_game'),
+        (views.GameList, games.format(urlencode({
+            'game_category': game_category.pk, 'ordering': 'release_date'})),
+         'games_game'),
+        (views.GameList, games.format(urlencode({
+            'owner': game.owner_id, 'ordering': 'release_date'})),
+         'games_game'),
+        (views.GameList, games.format(urlencode({
+            'release_date': timezone.localtime(game.release_date).strftime(date_format)})),
+         'games_game'),
+        ]
+
+
+def get_main_query(queries, table):
+    # The query that reads the columns of the rows of the page, not the
+    # count or the version queries
+    return next(
+        sql for sql in queries
+        if sql.startswith('SELECT "{0}".'.format(table)) and
+        ' ORDER BY ' in sql)
+
+
+class Command(BaseCommand):
+    help = ('Prints the query plan and the duration of each player scores '
+            'and games filter on a seeded scratch database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scores', type=int, default=200000)
+        parser.add_argument('--games', type=int, default=1000)
+        parser.add_argument('--players', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmarks.scratch_database(), benchmarks.unthrottled():
+            self.stdout.write('Seeding {0} scores...'.format(options['scores']))
+            benchmarks.seed_scores(
+                options['games'], options['players'], options['scores'])
+            for view_class, path, table in get_cases():
+                view = view_class.as_view()
+                sql = get_main_query(
+                    benchmarks.capture_view_queries(view, path), table)
+                self.stdout.write('')
+                self.stdout.write(benchmarks.format_durations(
+                    path, benchmarks.time_view(view, path, options['repeat'])))
+                for line in benchmarks.explain(sql):
+                    self.stdout.write('    ' + line)
@@ -0,0 +1,58 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from io import BytesIO
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from games import benchmarks
+from games.models import PlayerScore
+from games.parsers import FastJSONParser
+from games.queryplanner import get_query_plan
+from games.renderers import FastJSONRenderer
+from games.renderers import orjson
+from games.serializers import PlayerScoreSerializer
+
+
+class Command(BaseCommand):
+    help = ('Compares rendering and parsing a large page of player scores '
+            'with the JSON renderer and parser and the fast ones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write('orjson is not installed, the fast renderer '
+                              'and parser fall back to the json module.')
+        with benchmarks.scratch_database():
+            benchmarks.seed_scores(100, 1000, options['rows'])
+            player_scores = get_query_plan(PlayerScoreSerializer).apply(
+                PlayerScore.objects.all())
+            request = Request(APIRequestFactory().get('/player-scores/'))
+            data = PlayerScoreSerializer(
+                player_scores, many=True, context={'request': request}).data
+        content = JSONRenderer().render(data)
+        for label, renderer_class in (
+                ('JSONRenderer', JSONRenderer),
+                ('FastJSONRenderer', FastJSONRenderer)):
+            renderer = renderer_class()
+            self.stdout.write(benchmarks.format_durations(
+                label,
+                benchmarks.time_function(
+                    lambda: renderer.render(data), options['repeat'])))
+        for label, parser_class in (
+                ('JSONParser', JSONParser),
+                ('FastJSONParser', FastJSONParser)):
+            parser = parser_class()
+            self.stdout.write(benchmarks.format_durations(
+                label,
+                benchmarks.time_function(
+                    lambda: parser.parse(BytesIO(content)),
+                    options['repeat'])))
@@ -0,0 +1,48 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from django.core.management.base import BaseCommand
+from django.utils.http import urlencode
+from games import benchmarks
+from games import views
+from games.leaderboards import rebuild_leaderboards
+from games.models import Game
+
+
+class Command(BaseCommand):
+    help = ('Compares the game leaderboard endpoint with filtering and '
+            'sorting the player scores list on a scratch database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scores', type=int, default=1000000)
+        parser.add_argument('--games', type=int, default=100)
+        parser.add_argument('--players', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with benchmarks.scratch_database(), benchmarks.unthrottled():
+            self.stdout.write('Seeding {0} scores...'.format(options['scores']))
+            benchmarks.seed_scores(
+                options['games'], options['players'], options['scores'])
+            rebuild_leaderboards()
+            game = Game.objects.first()
+            player_scores_view = views.PlayerScoreList.as_view()
+            leaderboard_view = views.GameLeaderboard.as_view()
+            path = '/player-scores/?{0}'.format(urlencode({
+                'game_name': game.name,
+                'limit': 10,
+                }))
+            self.stdout.write(benchmarks.format_durations(
+                'player-scores/?game_name=',
+                benchmarks.time_view(
+                    player_scores_view, path, options['repeat'])))
+            self.stdout.write(benchmarks.format_durations(
+                'games/{pk}/leaderboard/',
+                benchmarks.time_view(
+                    leaderboard_view,
+                    '/games/{0}/leaderboard/'.format(game.pk),
+                    options['repeat'],
+                    pk=game.pk)))
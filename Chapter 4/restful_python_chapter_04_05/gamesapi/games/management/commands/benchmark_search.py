@@ -0,0 +1,44 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from django.core.management.base import BaseCommand
+from django.utils.http import urlencode
+from rest_framework import filters
+from games import benchmarks
+from games import views
+from games.search import NameSearchFilter
+from games.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = ('Compares searching the player names with LIKE and with their '
+            'full-text index on a seeded scratch database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmarks.scratch_database(), benchmarks.unthrottled():
+            self.stdout.write('Seeding {0} players...'.format(
+                options['players']))
+            benchmarks.seed_scores(1, options['players'], 0)
+            rebuild_search_index()
+            middle = options['players'] // 2
+            terms = (
+                'Player {0}'.format(middle),
+                'player {0}'.format(str(middle)[:2]),
+                str(middle),
+                )
+            for label, backend in (
+                    ('LIKE', filters.SearchFilter),
+                    ('FTS5', NameSearchFilter)):
+                view = views.PlayerList.as_view(filter_backends=(backend,))
+                for term in terms:
+                    path = '/players/?' + urlencode({'search': term})
+                    self.stdout.write(benchmarks.format_durations(
+                        '{0} {1}'.format(label, path),
+                        benchmarks.time_view(view, path, options['repeat'])))
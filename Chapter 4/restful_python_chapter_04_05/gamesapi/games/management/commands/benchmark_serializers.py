@@ -0,0 +1,54 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from games import benchmarks
+from games.models import Game
+from games.models import Player
+from games.models import PlayerScore
+from games.queryplanner import get_query_plan
+from games.serializers import GameSerializer
+from games.serializers import PlayerScoreSerializer
+from games.serializers import PlayerSerializer
+
+
+class Command(BaseCommand):
+    help = ('Compares serializing a page of games, player scores and players '
+            'with the compiled and the regular representation.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        factory = APIRequestFactory()
+        with benchmarks.scratch_database():
+            benchmarks.seed_scores(rows, rows, rows * 5)
+            for serializer_class, model in (
+                    (GameSerializer, Game),
+                    (PlayerScoreSerializer, PlayerScore),
+                    (PlayerSerializer, Player)):
+                # We only measure the serialization, not the queries
+                instances = list(get_query_plan(serializer_class).apply(
+                    model.objects.all())[:rows])
+
+                def serialize():
+                    request = Request(factory.get('/'))
+                    return serializer_class(
+                        instances,
+                        many=True,
+                        context={'request': request}).data
+
+                for label, compiled in (('regular', False), ('compiled', True)):
+                    with override_settings(GAMES_COMPILED_SERIALIZERS=compiled):
+                        self.stdout.write(benchmarks.format_durations(
+                            '{0} {1}'.format(serializer_class.__name__, label),
+                            benchmarks.time_function(
+                                serialize, options['repeat'])))
@@ -0,0 +1,171 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connection
+from django.db import connections
+from django.test import override_settings
+from django.utils import timezone
+from games import benchmarks
+from games.asgi import get_environ
+from games.models import Game
+from games.models import Player
+
+
+# The journal mode, pragmas and connection lifetime of each compared
+# configuration
+PROFILES = (
+    ('default', 'DELETE', {}, 0),
+    ('tuned', 'WAL', None, None),
+)
+
+
+def get_scope(method, path, body=b''):
+    headers = [(b'accept', b'application/json')]
+    if body:
+        headers.append((b'content-type', b'application/json'))
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'headers': headers,
+    }
+
+
+class MixedLoad(object):
+    """
+    Threads that read the player scores and threads that post new ones
+    through the WSGI handler until the duration elapsed, counting the
+    responses of each kind.
+    """
+    def __init__(self, readers, writers, duration, seed=0):
+        self.readers = readers
+        self.writers = writers
+        self.duration = duration
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        self.application = get_wsgi_application()
+        self.player_names = list(Player.objects.values_list('name', flat=True))
+        self.game_names = list(Game.objects.values_list('name', flat=True))
+
+    def request(self, method, path, body=b''):
+        status = []
+        iterable = self.application(
+            get_environ(get_scope(method, path, body), body),
+            lambda response_status, headers, exc_info=None:
+                status.append(response_status))
+        try:
+            b''.join(iterable)
+        finally:
+            # Closing the response is where Django closes old connections
+            iterable.close()
+        return int(status[0].split()[0])
+
+    def get_score_body(self):
+        with self.lock:
+            return json.dumps({
+                'score': self.random.randint(0, 10000),
+                'score_date': timezone.now().isoformat(),
+                'player': self.random.choice(self.player_names),
+                'game': self.random.choice(self.game_names),
+            }).encode('utf-8')
+
+    def work(self, write, deadline):
+        try:
+            while time.perf_counter() < deadline:
+                if write:
+                    status = self.request(
+                        'POST', '/player-scores/', self.get_score_body())
+                    succeeded = status == 201
+                else:
+                    succeeded = self.request('GET', '/player-scores/') == 200
+                key = ('writes' if write else 'reads') if succeeded else 'errors'
+                with self.lock:
+                    self.counts[key] += 1
+        finally:
+            connections.close_all()
+
+    def run(self):
+        deadline = time.perf_counter() + self.duration
+        threads = [
+            threading.Thread(target=self.work, args=(write, deadline))
+            for write in [False] * self.readers + [True] * self.writers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.counts
+
+
+class Command(BaseCommand):
+    help = ('Compares the throughput of concurrent reads and writes on a '
+            'SQLite database file with the SQLite defaults and a connection '
+            'per request, and with the WAL journal, GAMES_SQLITE_PRAGMAS and '
+            'persistent connections.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Seconds each configuration is loaded')
+        parser.add_argument('--games', type=int, default=100)
+        parser.add_argument('--players', type=int, default=100)
+        parser.add_argument('--scores', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The default database is not SQLite.')
+        settings_dict = connections.databases[DEFAULT_DB_ALIAS]
+        old_max_age = settings_dict.get('CONN_MAX_AGE', 0)
+        # Failed writes are counted, not logged
+        logging.getLogger('django.request').disabled = True
+        directory = tempfile.mkdtemp()
+        try:
+            for label, journal_mode, pragmas, max_age in PROFILES:
+                name = os.path.join(directory, '{0}.sqlite3'.format(label))
+                overrides = {} if pragmas is None else {
+                    'GAMES_SQLITE_PRAGMAS': pragmas}
+                if max_age is not None:
+                    settings_dict['CONN_MAX_AGE'] = max_age
+                try:
+                    with override_settings(**overrides), \
+                            benchmarks.scratch_database(name), \
+                            benchmarks.unthrottled():
+                        benchmarks.seed_scores(
+                            options['games'], options['players'],
+                            options['scores'], seed=options['seed'])
+                        with connection.cursor() as cursor:
+                            cursor.execute(
+                                'PRAGMA journal_mode={0}'.format(journal_mode))
+                        connection.close()
+                        counts = MixedLoad(
+                            options['readers'], options['writers'],
+                            options['duration'], options['seed']).run()
+                finally:
+                    settings_dict['CONN_MAX_AGE'] = old_max_age
+                self.stdout.write(
+                    '{0:<8} {1:8.1f} reads/s  {2:8.1f} writes/s  '
+                    '{3:6} errors'.format(
+                        label,
+                        counts['reads'] / options['duration'],
+                        counts['writes'] / options['duration'],
+                        counts['errors']))
+        finally:
+            logging.getLogger('django.request').disabled = False
+            os.rmdir(directory)
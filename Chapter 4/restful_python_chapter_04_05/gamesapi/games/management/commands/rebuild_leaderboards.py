@@ -0,0 +1,19 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from django.core.management.base import BaseCommand
+from games.leaderboards import rebuild_leaderboards
+from games.models import LeaderboardEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the top scores leaderboard of every game.'
+
+    def handle(self, *args, **options):
+        rebuild_leaderboards()
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt {0} leaderboard entries.'.format(
+                LeaderboardEntry.objects.count())))
@@ -0,0 +1,27 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from games.search import SEARCH_TABLES
+from games.search import get_search_table
+from games.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the full-text index of the game category, game and '
+            'player names.')
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        tables = [
+            get_search_table(model, DEFAULT_DB_ALIAS) for model in SEARCH_TABLES]
+        if None in tables:
+            self.stdout.write(self.style.WARNING(
+                'The database has no full-text index, searches use LIKE.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt the full-text index of {0} models.'.format(len(tables))))
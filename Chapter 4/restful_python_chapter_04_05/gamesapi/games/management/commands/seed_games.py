@@ -0,0 +1,187 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db import transaction
+from django.utils import timezone
+from games.conditional import bump_model_version
+from games.leaderboards import rebuild_leaderboards
+from games.models import GameCategory
+from games.models import Game
+from games.models import Player
+from games.models import PlayerScore
+from games.search import rebuild_search_index
+from games.stats import invalidate_queryset_stats
+
+
+def get_popularity(count, skew):
+    """
+    Return the cumulative Zipf weights of count items, so the item at
+    rank n is chosen about 1 / n ** skew times as often as the first one.
+    """
+    return list(accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def get_score(generator, alpha):
+    # Pareto distributed, most scores are low and a few are very high
+    return min(int(100 * generator.paretovariate(alpha)), 2 ** 31 - 1)
+
+
+def bulk_create_batches(model, objects, batch_size):
+    """
+    Insert the objects yielded by an iterator with bulk_create, in a
+    transaction for each batch_size objects. Return the number inserted.
+    """
+    count = 0
+    batch = []
+    for instance in objects:
+        batch.append(instance)
+        if len(batch) == batch_size:
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        count += len(batch)
+    return count
+
+
+def insert_rows(model, field_names, rows):
+    """
+    Insert rows of values for the fields with a single prepared
+    statement, skipping the SQL compilation bulk_create does for every
+    batch. The values must already be adapted to the database.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    sql = 'INSERT INTO {0} ({1}) VALUES ({2})'.format(
+        connection.ops.quote_name(model._meta.db_table),
+        ', '.join(connection.ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    return len(rows)
+
+
+class Command(BaseCommand):
+    help = ('Generates users, game categories, games, players and a skewed '
+            'distribution of player scores with bulk inserts, for load '
+            'testing. The same options and seed generate the same data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--games', type=int, default=10000)
+        parser.add_argument('--players', type=int, default=100000)
+        parser.add_argument('--scores', type=int, default=1000000)
+        parser.add_argument('--batch-size', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--skew', type=float, default=1.0,
+            help='Zipf exponent of the game and player popularity')
+        parser.add_argument(
+            '--alpha', type=float, default=1.5,
+            help='Pareto shape of the scores, lower is more skewed')
+        parser.add_argument(
+            '--prefix', default='Seed',
+            help='Prefix of the generated names')
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        prefix = options['prefix']
+        batch_size = options['batch_size']
+        if User.objects.filter(username__startswith=prefix.lower()).exists():
+            raise CommandError(
+                'Users named {0}... exist, use another --prefix.'.format(
+                    prefix.lower()))
+        now = timezone.now()
+        start = time.perf_counter()
+        # Bulk inserts send no signals, the leaderboards and model
+        # versions are updated once at the end instead of for every row
+        password = make_password(None)
+        User.objects.bulk_create([
+            User(
+                username='{0}{1}'.format(prefix.lower(), number),
+                email='{0}{1}@example.com'.format(prefix.lower(), number),
+                password=password)
+            for number in range(options['users'])])
+        GameCategory.objects.bulk_create([
+            GameCategory(name='{0} category {1}'.format(prefix, number))
+            for number in range(options['categories'])])
+        owner_ids = list(User.objects.filter(
+            username__startswith=prefix.lower()).values_list('pk', flat=True))
+        game_category_ids = list(GameCategory.objects.filter(
+            name__startswith=prefix).values_list('pk', flat=True))
+        bulk_create_batches(Game, (
+            Game(
+                owner_id=generator.choice(owner_ids),
+                name='{0} game {1}'.format(prefix, number),
+                game_category_id=generator.choice(game_category_ids),
+                release_date=now - timedelta(
+                    seconds=generator.randint(0, 10 * 365 * 86400)),
+                played=generator.random() < 0.5)
+            for number in range(options['games'])), batch_size)
+        bulk_create_batches(Player, (
+            Player(
+                name='{0} player {1}'.format(prefix, number),
+                gender=generator.choice((Player.MALE, Player.FEMALE)))
+            for number in range(options['players'])), batch_size)
+        # Ordered by primary key, so the first ones are the most popular
+        game_ids = list(Game.objects.filter(
+            name__startswith=prefix).order_by('pk').values_list('pk', flat=True))
+        player_ids = list(Player.objects.filter(
+            name__startswith=prefix).order_by('pk').values_list('pk', flat=True))
+        game_weights = get_popularity(len(game_ids), options['skew'])
+        player_weights = get_popularity(len(player_ids), options['skew'])
+        scores_count = options['scores']
+        adapt_datetime = connection.ops.adapt_datetimefield_value
+        created = 0
+        for batch_start in range(0, scores_count, batch_size):
+            batch_count = min(batch_size, scores_count - batch_start)
+            games = generator.choices(
+                game_ids, cum_weights=game_weights, k=batch_count)
+            players = generator.choices(
+                player_ids, cum_weights=player_weights, k=batch_count)
+            # Most of the time goes to these rows, so they skip the
+            # model instances and bulk_create
+            created += insert_rows(
+                PlayerScore,
+                ('player', 'game', 'score', 'score_date'),
+                [(player_id,
+                  game_id,
+                  get_score(generator, options['alpha']),
+                  adapt_datetime(now - timedelta(
+                      seconds=generator.randint(0, 365 * 86400))))
+                 for game_id, player_id in zip(games, players)])
+            if options['verbosity'] > 1:
+                self.stdout.write('{0} scores in {1:.1f} s'.format(
+                    created, time.perf_counter() - start))
+        rebuild_leaderboards()
+        rebuild_search_index()
+        for model in (User, GameCategory, Game, Player, PlayerScore):
+            bump_model_version(model)
+        invalidate_queryset_stats(
+            'game', Game.objects.filter(name__startswith=prefix), 'pk')
+        invalidate_queryset_stats(
+            'player', Player.objects.filter(name__startswith=prefix), 'pk')
+        self.stdout.write(self.style.SUCCESS(
+            'Created {0} users, {1} game categories, {2} games, {3} players '
+            'and {4} scores in {5:.1f} s.'.format(
+                len(owner_ids),
+                len(game_category_ids),
+                len(game_ids),
+                len(player_ids),
+                created,
+                time.perf_counter() - start)))
@@ -0,0 +1,91 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import os
+import shutil
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+def copy_sqlite_database(source, target):
+    """
+    Replace the target file with a consistent copy of the source SQLite
+    database. Writers wait while the file is copied, and connections
+    opened on the target afterwards see the new copy. Connections that
+    were already open keep reading the previous copy, so the replicas
+    must not keep their connections between requests.
+
+    In WAL mode the committed transactions are moved from the -wal file
+    to the main file first, and the copy waits until no other commit
+    reached the -wal file in between.
+    """
+    temporary = '{0}.{1}.tmp'.format(target, os.getpid())
+    connection = sqlite3.connect(source, timeout=30, isolation_level=None)
+    try:
+        while True:
+            connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            # The reserved lock keeps other connections from committing
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                wal = source + '-wal'
+                if os.path.exists(wal) and os.path.getsize(wal):
+                    continue
+                shutil.copyfile(source, temporary)
+                break
+            finally:
+                connection.execute('ROLLBACK')
+    finally:
+        connection.close()
+    # The -wal and -shm files of the previous copy would be replayed
+    # onto the new one
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    os.replace(temporary, target)
+
+
+class Command(BaseCommand):
+    help = ('Copies the default SQLite database to the SQLite read '
+            'replicas, once or every --interval seconds, to try the read '
+            'replica routing locally.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Seconds between copies, copies once if missing')
+
+    def handle(self, *args, **options):
+        databases = settings.DATABASES
+        replicas = getattr(settings, 'GAMES_READ_REPLICAS', [])
+        sqlite_engine = 'django.db.backends.sqlite3'
+        if databases[DEFAULT_DB_ALIAS]['ENGINE'] != sqlite_engine:
+            raise CommandError('The default database is not SQLite.')
+        replicas = [
+            alias for alias in replicas
+            if databases[alias]['ENGINE'] == sqlite_engine]
+        if not replicas:
+            raise CommandError(
+                'There are no SQLite read replicas, set GAMES_SQLITE_REPLICA.')
+        for alias in replicas:
+            if databases[alias].get('CONN_MAX_AGE'):
+                self.stderr.write(self.style.WARNING(
+                    'The connections to {0} are kept open, they will read '
+                    'the previous copy until they are closed. Set its '
+                    'CONN_MAX_AGE to 0.'.format(alias)))
+        while True:
+            for alias in replicas:
+                copy_sqlite_database(
+                    databases[DEFAULT_DB_ALIAS]['NAME'],
+                    databases[alias]['NAME'])
+                self.stdout.write('Copied the default database to {0}.'.format(
+                    alias))
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,250 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import logging
+import random
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connections
+from django.db.backends.utils import CursorWrapper
+from games.routers import get_read_replicas
+from games.routers import use_replicas
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimings(object):
+    """
+    The queries a request ran and the time it spent in them, in the
+    view and rendering the response. The SQL is only kept for sampled
+    requests.
+    """
+    def __init__(self, sampled):
+        self.sampled = sampled
+        self.queries = []
+        self.query_count = 0
+        self.db_duration = 0.0
+        self.start = time.perf_counter()
+        self.view_start = None
+        self.view_end = None
+        self.view_db_duration = 0.0
+        self.end = None
+
+    def record_query(self, sql, params, duration):
+        self.query_count += 1
+        self.db_duration += duration
+        if self.sampled:
+            self.queries.append((sql, params, duration))
+
+    def start_view(self):
+        self.view_start = time.perf_counter()
+        self.view_db_duration = self.db_duration
+
+    def end_view(self):
+        self.view_end = time.perf_counter()
+        self.view_db_duration = self.db_duration - self.view_db_duration
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    @property
+    def total_duration(self):
+        return self.end - self.start
+
+    def get_metrics(self):
+        """
+        Return the (name, seconds, description) of each measured phase.
+        The view phase excludes its queries, so for the API views it is
+        mostly serialization.
+        """
+        metrics = [('db', self.db_duration, '{0} queries'.format(
+            self.query_count))]
+        if self.view_start is not None and self.view_end is not None:
+            metrics.append((
+                'view',
+                self.view_end - self.view_start - self.view_db_duration,
+                'View and serialization'))
+            # Responses are rendered right after the template response
+            # middleware ran
+            metrics.append(('render', self.end - self.view_end, 'Rendering'))
+        metrics.append(('total', self.total_duration, 'Total'))
+        return metrics
+
+    def get_header(self):
+        return ', '.join(
+            '{0};dur={1:.3f};desc="{2}"'.format(name, duration * 1000, description)
+            for name, duration, description in self.get_metrics())
+
+
+class RecordingCursorWrapper(CursorWrapper):
+    """
+    Wraps the cursor of a connection to time every query it executes.
+    """
+    def __init__(self, cursor, db, timings):
+        super(RecordingCursorWrapper, self).__init__(cursor, db)
+        self.timings = timings
+
+    def execute(self, sql, params=None):
+        start = time.perf_counter()
+        try:
+            return super(RecordingCursorWrapper, self).execute(sql, params)
+        finally:
+            self.timings.record_query(sql, params, time.perf_counter() - start)
+
+    def executemany(self, sql, param_list):
+        start = time.perf_counter()
+        try:
+            return super(RecordingCursorWrapper, self).executemany(
+                sql, param_list)
+        finally:
+            self.timings.record_query(
+                sql, param_list, time.perf_counter() - start)
+
+
+@contextmanager
+def recording_queries(timings):
+    """
+    Record the queries that the connections of the current thread run
+    within the block. The cursor factories of each connection are
+    replaced for the block, whether queries are logged or not.
+    """
+    patched = []
+    for connection in connections.all():
+        saved = dict(
+            (name, connection.__dict__.get(name))
+            for name in ('make_cursor', 'make_debug_cursor'))
+        for name in saved:
+            make_cursor = getattr(connection, name)
+            setattr(
+                connection, name,
+                lambda cursor, make_cursor=make_cursor, connection=connection:
+                    RecordingCursorWrapper(
+                        make_cursor(cursor), connection, timings))
+        patched.append((connection, saved))
+    try:
+        yield timings
+    finally:
+        for connection, saved in patched:
+            for name, make_cursor in saved.items():
+                if make_cursor is None:
+                    delattr(connection, name)
+                else:
+                    setattr(connection, name, make_cursor)
+
+
+class ServerTimingMiddleware(object):
+    """
+    Adds a Server-Timing header with the number of queries, the time
+    spent in them, in the view and serialization, rendering and in
+    total to every response.
+
+    A GAMES_SLOW_REQUEST_SAMPLE_RATE fraction of the requests keep their
+    SQL, and the sampled ones that took GAMES_SLOW_REQUEST_THRESHOLD
+    milliseconds or more are logged with it. Only the queries are
+    counted and timed for the other requests.
+
+    Streaming responses run their queries while the body is sent, after
+    the headers, so they have no Server-Timing header. Their queries are
+    recorded until the body was sent, and then they are logged.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = getattr(settings, 'GAMES_SLOW_REQUEST_SAMPLE_RATE', 0)
+        timings = RequestTimings(
+            sample_rate > 0 and random.random() < sample_rate)
+        request._request_timings = timings
+        with recording_queries(timings):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.stream_content(
+                request, response, timings, response.streaming_content)
+            return response
+        timings.finish()
+        response['Server-Timing'] = timings.get_header()
+        if timings.sampled:
+            self.log_slow_request(request, response, timings)
+        return response
+
+    def stream_content(self, request, response, timings, content):
+        with recording_queries(timings):
+            for chunk in content:
+                yield chunk
+        timings.finish()
+        if timings.sampled:
+            self.log_slow_request(request, response, timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._request_timings.start_view()
+
+    def process_template_response(self, request, response):
+        request._request_timings.end_view()
+        return response
+
+    def log_slow_request(self, request, response, timings):
+        threshold = getattr(settings, 'GAMES_SLOW_REQUEST_THRESHOLD', 500)
+        duration = timings.total_duration * 1000
+        if duration < threshold:
+            return
+        lines = [
+            '{0:.3f} ms {1} {2!r}'.format(query_duration * 1000, sql, params)
+            for sql, params, query_duration in timings.queries]
+        logger.warning(
+            'Slow request %s %s (%s): %.3f ms, %s queries in %.3f ms\n%s',
+            request.method,
+            request.get_full_path(),
+            response.status_code,
+            duration,
+            timings.query_count,
+            timings.db_duration * 1000,
+            '\n'.join(lines))
+
+
+class ReadReplicaMiddleware(object):
+    """
+    Lets ReadReplicaRouter send the reads of safe requests to the read
+    replicas. A client that sent an unsafe request gets a cookie that
+    keeps its reads on the primary for GAMES_REPLICA_PIN_SECONDS, so it
+    sees its own writes before they reach the replicas. Clients that
+    don't send the cookie back read from the replicas right after their
+    writes. Streaming responses keep reading from the replicas while the
+    body is sent.
+    """
+    cookie_name = 'games_primary'
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in self.safe_methods
+        enabled = safe and self.cookie_name not in request.COOKIES
+        use_replicas(enabled)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replicas(False)
+        if response.streaming:
+            response.streaming_content = self.stream_content(
+                enabled, response.streaming_content)
+        if not safe and get_read_replicas():
+            response.set_cookie(
+                self.cookie_name,
+                '1',
+                max_age=getattr(settings, 'GAMES_REPLICA_PIN_SECONDS', 5),
+                httponly=True)
+        return response
+
+    def stream_content(self, enabled, content):
+        use_replicas(enabled)
+        try:
+            for chunk in content:
+                yield chunk
+        finally:
+            use_replicas(False)
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.1 on 2026-10-18 08:44
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0004_game_owner'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='playerscore',
+            index_together=set([('score', 'id'), ('score_date', 'id')]),
+        ),
+    ]
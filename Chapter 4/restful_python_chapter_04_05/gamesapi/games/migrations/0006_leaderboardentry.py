@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.1 on 2026-10-18 08:47
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_leaderboards(apps, schema_editor):
+    Game = apps.get_model('games', 'Game')
+    PlayerScore = apps.get_model('games', 'PlayerScore')
+    LeaderboardEntry = apps.get_model('games', 'LeaderboardEntry')
+    size = getattr(settings, 'GAMES_LEADERBOARD_SIZE', 10)
+    for game_id in Game.objects.values_list('pk', flat=True):
+        top_scores = PlayerScore.objects.filter(
+            game_id=game_id).order_by('-score', 'pk')[:size]
+        LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(
+                game_id=game_id,
+                player_score_id=player_score_id,
+                score=score)
+            for player_score_id, score in top_scores.values_list('pk', 'score')])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0005_playerscore_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField()),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='games.Game')),
+            ],
+            options={
+                'ordering': ('-score', 'player_score_id'),
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='playerscore',
+            index_together=set([('score', 'id'), ('game', 'score'), ('score_date', 'id')]),
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='player_score',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to='games.PlayerScore'),
+        ),
+        migrations.AlterIndexTogether(
+            name='leaderboardentry',
+            index_together=set([('game', 'score')]),
+        ),
+        migrations.RunPython(build_leaderboards, migrations.RunPython.noop),
+    ]
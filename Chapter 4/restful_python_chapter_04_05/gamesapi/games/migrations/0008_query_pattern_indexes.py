@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.1 on 2026-10-18 08:56
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('games', '0007_modelversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='game',
+            name='release_date',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterIndexTogether(
+            name='game',
+            index_together=set([('owner', 'release_date'), ('game_category', 'release_date'), ('played', 'release_date')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='playerscore',
+            index_together=set([('player', 'score'), ('score_date', 'id'), ('game', 'score'), ('score', 'id')]),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+SEARCH_TABLES = (
+    ('games_gamecategory_search', 'games_gamecategory'),
+    ('games_game_search', 'games_game'),
+    ('games_player_search', 'games_player'),
+)
+
+
+def create_search_tables(apps, schema_editor):
+    # The names are only indexed on SQLite builds with FTS5, the other
+    # databases keep searching with LIKE
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, source in SEARCH_TABLES:
+            try:
+                cursor.execute(
+                    "CREATE VIRTUAL TABLE {0} USING fts5("
+                    "name, prefix='2 3')".format(table))
+            except OperationalError:
+                return
+            cursor.execute(
+                'INSERT INTO {0} (rowid, name) SELECT id, name FROM {1}'.format(
+                    table, source))
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, source in SEARCH_TABLES:
+            cursor.execute('DROP TABLE IF EXISTS {0}'.format(table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0008_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def set_journal_mode(mode):
+    def set_mode(apps, schema_editor):
+        # With WAL readers don't block the writer. The mode is stored in
+        # the database file, so it is set once instead of per connection.
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode={0}'.format(mode))
+    return set_mode
+
+
+class Migration(migrations.Migration):
+
+    # The journal mode can't change within a transaction
+    atomic = False
+
+    dependencies = [
+        ('games', '0009_name_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode('WAL'), set_journal_mode('DELETE')),
+    ]
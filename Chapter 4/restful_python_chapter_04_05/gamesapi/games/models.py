@@ -5,6 +5,7 @@ Author: Gaston C. Hillar - Twitter.com/gastonhillar
 Publisher: Packt Publishing Ltd. - http://www.packtpub.com
 """
 from django.db import models
+from django.db import transaction
 
 
 class GameCategory(models.Model):
@@ -28,11 +29,17 @@ class Game(models.Model):
         GameCategory, 
         related_name='games', 
         on_delete=models.CASCADE)
-    release_date = models.DateTimeField()
+    release_date = models.DateTimeField(db_index=True)
     played = models.BooleanField(default=False)
 
     class Meta:
         ordering = ('name',)
+        # GameList filters on these fields and orders by release date
+        index_together = (
+            ('played', 'release_date'),
+            ('game_category', 'release_date'),
+            ('owner', 'release_date'),
+            )
 
     def __str__(self):
         return self.name
@@ -74,3 +81,49 @@ class PlayerScore(models.Model):
     class Meta:
         # Order by score descending
         ordering = ('-score',)
+        # Keyset pagination seeks on (ordering field, pk)
+        index_together = (
+            ('score', 'id'),
+            ('score_date', 'id'),
+            # Top scores for a game or a player, used by the name filters
+            # and to refresh the game leaderboard
+            ('game', 'score'),
+            ('player', 'score'),
+            )
+
+    def save(self, *args, **kwargs):
+        # The post_save receiver updates the game leaderboard
+        # within the same transaction
+        with transaction.atomic():
+            super(PlayerScore, self).save(*args, **kwargs)
+
+
+class LeaderboardEntry(models.Model):
+    game = models.ForeignKey(
+        Game,
+        related_name='leaderboard_entries',
+        on_delete=models.CASCADE)
+    player_score = models.OneToOneField(
+        PlayerScore,
+        related_name='leaderboard_entry',
+        on_delete=models.CASCADE)
+    # Copied from the player score to rank the entries with an index
+    score = models.IntegerField()
+
+    class Meta:
+        # Equal scores are ranked by which one was posted first
+        ordering = ('-score', 'player_score_id')
+        index_together = (
+            ('game', 'score'),
+            )
+
+
+class ModelVersion(models.Model):
+    # Bumped on every change to the rows of a model, see games.conditional,
+    # or to the scores of a player or a game, see games.stats
+    label = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveIntegerField(default=0)
+    modified = models.DateTimeField()
+
+    def __str__(self):
+        return '{0} {1}'.format(self.label, self.version)
@@ -0,0 +1,177 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import sqlite3
+from collections import OrderedDict
+from django.conf import settings
+from django.db import connections
+from django.db import models
+from django.db.models import Prefetch
+from django.db.models import prefetch_related_objects
+from django.utils.http import urlencode
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+from games.queryplanner import get_query_plan
+
+
+def get_nested_limit():
+    return getattr(settings, 'GAMES_NESTED_LIMIT', 10)
+
+
+def supports_window_functions(connection):
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 25, 0)
+    return connection.vendor in ('postgresql', 'oracle')
+
+
+def get_ordering_sql(model, connection):
+    # The default ordering of the model, then the primary key for ties
+    columns = []
+    for name in list(model._meta.ordering) + ['pk']:
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        columns.append('{0}{1}'.format(
+            connection.ops.quote_name(field.column),
+            ' DESC' if descending else ''))
+    return ', '.join(columns)
+
+
+def fetch_bounded_rows(relation, parent_pks, limit):
+    """
+    Return the total number of rows of a reverse foreign key relation
+    for each parent primary key, and the first limit rows in the default
+    ordering of the related model. A single query ranks the rows with
+    window functions, databases without them run two per parent.
+    """
+    related_model = relation.related_model
+    foreign_key = relation.field
+    counts = dict((pk, 0) for pk in parent_pks)
+    rows = dict((pk, []) for pk in parent_pks)
+    queryset = related_model._default_manager.filter(
+        **{foreign_key.name + '__in': parent_pks}).order_by()
+    # The database the router picked, which may be a read replica
+    connection = connections[queryset.db]
+    if supports_window_functions(connection):
+        inner_sql, params = queryset.query.sql_with_params()
+        column = connection.ops.quote_name(foreign_key.column)
+        sql = (
+            'SELECT * FROM ('
+            'SELECT nested_rows.*, '
+            'ROW_NUMBER() OVER (PARTITION BY {0} ORDER BY {1}) AS nested_rank, '
+            'COUNT(*) OVER (PARTITION BY {0}) AS nested_count '
+            'FROM ({2}) nested_rows) ranked_rows '
+            'WHERE nested_rank <= %s '
+            'ORDER BY {0}, nested_rank').format(
+                column, get_ordering_sql(related_model, connection), inner_sql)
+        for row in related_model._default_manager.db_manager(
+                queryset.db).raw(sql, tuple(params) + (limit,)):
+            parent_pk = getattr(row, foreign_key.attname)
+            counts[parent_pk] = row.nested_count
+            rows[parent_pk].append(row)
+    else:
+        for pk in parent_pks:
+            parent_rows = queryset.filter(**{foreign_key.attname: pk})
+            counts[pk] = parent_rows.count()
+            rows[pk] = list(parent_rows.order_by(
+                *(list(related_model._meta.ordering) + ['pk']))[:limit])
+    return counts, rows
+
+
+class BoundedNestedField(serializers.Field):
+    """
+    Read only representation of a reverse foreign key with the number of
+    related rows, a link to the list view filtered to all of them, and
+    the first GAMES_NESTED_LIMIT rows represented by the child field.
+
+    A parent that is represented on its own fetches its rows when the
+    field reads them. BoundedNestedListSerializer fetches the rows of
+    every parent in a page at once.
+    """
+    def __init__(self, child, list_view_name, filter_name, limit=None, **kwargs):
+        kwargs['read_only'] = True
+        super(BoundedNestedField, self).__init__(**kwargs)
+        self.child = child
+        self.list_view_name = list_view_name
+        self.filter_name = filter_name
+        self.limit = limit
+        self.child.bind(field_name='', parent=self)
+
+    def get_relation(self):
+        return self.parent.Meta.model._meta.get_field(self.source)
+
+    def get_cache_name(self):
+        return '_bounded_{0}'.format(self.source)
+
+    def get_models(self):
+        """
+        Return the models the representation reads, for the query plan.
+        """
+        related_model = self.get_relation().related_model
+        if isinstance(self.child, serializers.ModelSerializer):
+            return [related_model] + get_query_plan(type(self.child)).models
+        return [related_model]
+
+    def prefetch(self, instances):
+        """
+        Fetch the bounded rows of every instance with a single query,
+        plus the queries the child serializer plans for them.
+        """
+        cache_name = self.get_cache_name()
+        instances = [
+            instance for instance in instances
+            if not hasattr(instance, cache_name)]
+        if not instances:
+            return
+        counts, rows = fetch_bounded_rows(
+            self.get_relation(),
+            [instance.pk for instance in instances],
+            self.limit or get_nested_limit())
+        if isinstance(self.child, serializers.ModelSerializer):
+            plan = get_query_plan(type(self.child))
+            lookups = list(plan.select_related) + [
+                Prefetch(lookup, queryset=child_plan.apply(
+                    model._default_manager.all()))
+                for lookup, model, child_plan in plan.prefetch_related]
+            if lookups:
+                prefetch_related_objects(
+                    [row for parent_rows in rows.values() for row in parent_rows],
+                    *lookups)
+        for instance in instances:
+            setattr(instance, cache_name, (counts[instance.pk], rows[instance.pk]))
+
+    def get_attribute(self, instance):
+        self.prefetch([instance])
+        count, rows = getattr(instance, self.get_cache_name())
+        return instance.pk, count, rows
+
+    def to_representation(self, value):
+        pk, count, rows = value
+        request = self.context.get('request', None)
+        url = '{0}?{1}'.format(
+            reverse(self.list_view_name, request=request),
+            urlencode({self.filter_name: pk}))
+        return OrderedDict([
+            ('count', count),
+            ('url', url),
+            ('results', [self.child.to_representation(row) for row in rows]),
+            ])
+
+
+class BoundedNestedListSerializer(serializers.ListSerializer):
+    """
+    List serializer that fetches the rows of the bounded nested fields
+    for all the instances before representing them.
+    """
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        instances = list(data)
+        for field in self.child.fields.values():
+            if isinstance(field, BoundedNestedField):
+                field.prefetch(instances)
+        return super(BoundedNestedListSerializer, self).to_representation(
+            instances)
@@ -4,8 +4,268 @@ Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
 Author: Gaston C. Hillar - Twitter.com/gastonhillar
 Publisher: Packt Publishing Ltd. - http://www.packtpub.com
 """
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.db.models.sql.datastructures import EmptyResultSet
+from django.template import loader
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.compat import template_render
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
 from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.pagination import _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from games.conditional import get_model_versions
 
 
 class LimitOffsetPaginationWithMaxLimit(LimitOffsetPagination):
     max_limit = 10
+
+
+class CachedCountPagination(LimitOffsetPaginationWithMaxLimit):
+    """
+    A limit/offset style that doesn't run a COUNT(*) for every page.
+    Counts are cached for each query and version of the model, counting
+    stops at GAMES_COUNT_THRESHOLD rows and clients that don't need the
+    count can skip it. For example:
+
+    http://api.example.org/games/?played=True&count=false
+    """
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.offset = self.get_offset(request)
+        self.request = request
+        self.count_capped = False
+        self.count = None
+        if self.should_count(request):
+            self.count = self.get_count(queryset, view)
+        # We fetch an extra row to know whether another page follows,
+        # the count may be capped or a few seconds old
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.page = results[:self.limit]
+        self.has_next = len(results) > self.limit
+        if ((self.has_next or self.offset > 0) and
+                self.template is not None):
+            self.display_page_controls = True
+        return self.page
+
+    def should_count(self, request):
+        value = request.query_params.get(self.count_query_param, '')
+        return value.lower() not in ('false', '0')
+
+    def get_count_cache_key(self, queryset, view):
+        # The versions change with every write to the models
+        versions = getattr(view, 'model_versions', None)
+        if versions is None:
+            versions = get_model_versions([queryset.model])
+        sql, params = queryset.query.sql_with_params()
+        return 'games:count:{0}'.format(hashlib.sha1(
+            repr((sql, params, versions)).encode('utf-8')).hexdigest())
+
+    def get_count(self, queryset, view):
+        threshold = getattr(settings, 'GAMES_COUNT_THRESHOLD', 10000)
+        # The order doesn't change the count, and without it the capped
+        # count doesn't sort the filtered rows
+        queryset = queryset.order_by()
+        try:
+            cache_key = self.get_count_cache_key(queryset, view)
+        except EmptyResultSet:
+            # Filters that can't match any row have no SQL to cache
+            return 0
+        count = cache.get(cache_key)
+        if count is None:
+            # Counting a sliced queryset stops reading after the threshold
+            count = queryset[:threshold + 1].count()
+            cache.set(
+                cache_key,
+                count,
+                getattr(settings, 'GAMES_COUNT_CACHE_TIMEOUT', 60))
+        if count > threshold:
+            self.count_capped = True
+            count = threshold
+        return count
+
+    def get_paginated_response(self, data):
+        response_data = OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ])
+        if self.count_capped:
+            # The count means "more than count"
+            response_data['count_capped'] = True
+        return Response(response_data)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        offset = self.offset + self.limit
+        return replace_query_param(url, self.offset_query_param, offset)
+
+    def get_html_context(self):
+        # The page links need at least the rows we know about
+        count = self.count
+        self.count = max(
+            count or 0,
+            self.offset + len(self.page) + (1 if self.has_next else 0))
+        try:
+            return super(CachedCountPagination, self).get_html_context()
+        finally:
+            self.count = count
+
+    def get_fields(self, view):
+        return super(CachedCountPagination, self).get_fields(view) + [
+            self.count_query_param]
+
+
+class KeysetPagination(BasePagination):
+    """
+    A keyset based style that seeks past the last row of the previous
+    page instead of using OFFSET and never runs a COUNT(*), so every
+    page costs the same. The position is the value of the ordering field
+    plus the primary key, which breaks ties between equal values.
+    For example:
+
+    http://api.example.org/player-scores/?ordering=-score
+    http://api.example.org/player-scores/?ordering=-score&cursor=WyItc2...
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = api_settings.PAGE_SIZE
+    max_limit = 10
+    # Used when the request doesn't order by one of the view's ordering_fields
+    ordering = '-score'
+    invalid_cursor_message = _('Invalid cursor')
+    template = 'rest_framework/pagination/previous_and_next.html'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, view)
+        field_name = self.ordering.lstrip('-')
+        self.model_field = queryset.model._meta.get_field(field_name)
+        position, reverse = self.decode_cursor(request)
+
+        # A reverse cursor walks back from the first row of the next page
+        descending = self.ordering.startswith('-') != reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(prefix + field_name, prefix + 'pk')
+        if position is not None:
+            value, pk = position
+            # The leading range condition lets the database seek the
+            # composite (field, pk) index instead of scanning it
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                **{'{0}__{1}e'.format(field_name, lookup): value})
+            queryset = queryset.filter(
+                Q(**{'{0}__{1}'.format(field_name, lookup): value}) |
+                Q(**{'pk__{0}'.format(lookup): pk}))
+
+        # We always fetch an extra row to know whether another page follows
+        results = list(queryset[:self.limit + 1])
+        self.page = results[:self.limit]
+        has_following = len(results) > self.limit
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = position is not None
+        if (self.has_next or self.has_previous) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_limit(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.limit_query_param],
+                strict=True,
+                cutoff=self.max_limit
+            )
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def get_ordering(self, request, view):
+        params = request.query_params.get(api_settings.ORDERING_PARAM)
+        if params:
+            ordering = params.split(',')[0].strip()
+            if ordering.lstrip('-') in getattr(view, 'ordering_fields', ()):
+                return ordering
+        return self.ordering
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            ordering, value, pk, reverse = json.loads(
+                urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if ordering != self.ordering:
+                raise ValueError()
+            position = (self.model_field.to_python(value), int(pk))
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(reverse)
+
+    def encode_cursor(self, instance, reverse):
+        cursor = [
+            self.ordering,
+            self.model_field.value_to_string(instance),
+            instance.pk,
+            int(reverse),
+        ]
+        encoded = urlsafe_b64encode(
+            json.dumps(cursor).encode('utf-8')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # We walked back past the first row
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_html_context(self):
+        return {
+            'previous_url': self.get_previous_link(),
+            'next_url': self.get_next_link()
+        }
+
+    def to_html(self):
+        template = loader.get_template(self.template)
+        context = self.get_html_context()
+        return template_render(template, context)
+
+    def get_fields(self, view):
+        return [self.cursor_query_param, self.limit_query_param]
@@ -0,0 +1,37 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import codecs
+from django.conf import settings
+from django.utils import six
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+from games.renderers import FastJSONRenderer
+from games.renderers import orjson
+
+
+class FastJSONParser(parsers.JSONParser):
+    """
+    A JSONParser that decodes with orjson when it is installed and
+    parses exactly like the JSONParser otherwise. orjson rejects the
+    NaN and Infinity constants that the json module accepts.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super(FastJSONParser, self).parse(
+                stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read()
+            # orjson reads UTF-8 bytes, other encodings are decoded first
+            if codecs.lookup(encoding).name != 'utf-8':
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % six.text_type(exc))
@@ -12,4 +12,14 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         else:
-            return obj.owner == request.user
+            # Comparing the keys doesn't load the owner row
+            return obj.owner_id == request.user.pk
+
+    def filter_queryset(self, request, queryset):
+        """
+        Return the rows of the queryset the request may change, so bulk
+        operations check the ownership in SQL instead of for each object.
+        """
+        if request.method in permissions.SAFE_METHODS:
+            return queryset
+        return queryset.filter(owner_id=request.user.pk)
@@ -0,0 +1,130 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import RelatedField
+
+
+class QueryPlan(object):
+    """
+    The select_related and prefetch_related lookups required to
+    serialize a queryset without running additional queries per row.
+    """
+    def __init__(self):
+        self.select_related = []
+        # Each prefetch is a (lookup, related model, nested plan) tuple
+        self.prefetch_related = []
+        # Every model whose rows the representation reads
+        self.models = []
+
+    def add_model(self, model):
+        if model not in self.models:
+            self.models.append(model)
+
+    def add_select_related(self, lookup):
+        if lookup not in self.select_related:
+            self.select_related.append(lookup)
+
+    def add_prefetch_related(self, lookup, model, plan):
+        for existing_lookup, existing_model, existing_plan in self.prefetch_related:
+            if existing_lookup == lookup:
+                return
+        self.prefetch_related.append((lookup, model, plan))
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            # Each prefetch runs a single query that is planned in turn
+            queryset = queryset.prefetch_related(*[
+                Prefetch(
+                    lookup,
+                    queryset=plan.apply(model._default_manager.all()))
+                for lookup, model, plan in self.prefetch_related])
+        return queryset
+
+
+def _plan_serializer(serializer, model, plan, prefix=''):
+    plan.add_model(model)
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        if hasattr(field, 'get_models'):
+            # Fields that fetch their own rows, such as BoundedNestedField
+            for related_model in field.get_models():
+                plan.add_model(related_model)
+            continue
+        _plan_field(field, model, plan, prefix)
+
+
+def _plan_field(field, model, plan, prefix):
+    source_attrs = field.source_attrs
+    for index, attr in enumerate(source_attrs):
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            # Methods and properties such as get_gender_display
+            return
+        if not model_field.is_relation:
+            return
+        lookup = prefix + attr
+        related_model = model_field.related_model
+        is_last = index == len(source_attrs) - 1
+        if model_field.one_to_many or model_field.many_to_many:
+            child_plan = QueryPlan()
+            if is_last and isinstance(field, serializers.ListSerializer):
+                _plan_serializer(field.child, related_model, child_plan)
+            plan.add_prefetch_related(lookup, related_model, child_plan)
+            plan.add_model(related_model)
+            for child_model in child_plan.models:
+                plan.add_model(child_model)
+            return
+        plan.add_model(related_model)
+        if not is_last:
+            plan.add_select_related(lookup)
+            model = related_model
+            prefix = lookup + '__'
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            plan.add_select_related(lookup)
+            _plan_serializer(field, related_model, plan, lookup + '__')
+        elif (isinstance(field, RelatedField) and
+                field.use_pk_only_optimization() and model_field.concrete):
+            # Related fields that only render the primary key read the
+            # foreign key column and never touch the related row
+            return
+        else:
+            plan.add_select_related(lookup)
+
+
+_query_plans = {}
+
+
+def get_query_plan(serializer_class):
+    """
+    Walk the field tree of a model serializer class and return the
+    QueryPlan that fetches everything its representation reads.
+    """
+    plan = _query_plans.get(serializer_class)
+    if plan is None:
+        plan = QueryPlan()
+        _plan_serializer(
+            serializer_class(), serializer_class.Meta.model, plan)
+        _query_plans[serializer_class] = plan
+    return plan
+
+
+class QueryPlannerMixin(object):
+    """
+    Generic view mixin that applies the query plan of the view's
+    serializer class to its queryset, so that a page of results is
+    retrieved with a fixed number of queries.
+    """
+    def get_queryset(self):
+        queryset = super(QueryPlannerMixin, self).get_queryset()
+        return get_query_plan(self.get_serializer_class()).apply(queryset)
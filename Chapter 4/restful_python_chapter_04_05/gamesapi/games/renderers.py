@@ -0,0 +1,120 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import csv
+import json
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Encodes the types orjson doesn't handle itself, or handles differently,
+# such as datetimes, Decimals and lazy strings, like the JSONRenderer
+encode_default = JSONEncoder().default
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    A JSONRenderer that encodes with orjson when it is installed. Without
+    orjson, for indented output and for data orjson rejects, such as
+    dictionaries with keys that aren't strings, it renders exactly like
+    the JSONRenderer. Both only differ in the notation of floats with an
+    exponent, such as 1e16 for 1e+16, and in rendering NaN as null.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if (orjson is None or data is None or
+                self.ensure_ascii or not self.compact or
+                self.get_indent(accepted_media_type, renderer_context)
+                is not None):
+            return super(FastJSONRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=encode_default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            return super(FastJSONRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+        # We escape \u2028 and \u2029 like the JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(
+                b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class StreamingRenderer(renderers.BaseRenderer):
+    """
+    Base class for the export renderers. render_rows turns an iterable of
+    value tuples into an iterable of byte strings, one for every chunk of
+    rows, which a StreamingHttpResponse sends as it is consumed.
+    render is only used for error responses.
+    """
+    charset = 'utf-8'
+    rows_per_chunk = 500
+
+    def render_header(self, fields):
+        return ''
+
+    def render_row(self, fields, row):
+        raise NotImplementedError('.render_row() must be implemented.')
+
+    def render_rows(self, fields, rows):
+        lines = [self.render_header(fields)]
+        for row in rows:
+            lines.append(self.render_row(fields, row))
+            if len(lines) >= self.rows_per_chunk:
+                yield ''.join(lines).encode(self.charset)
+                lines = []
+        if lines:
+            yield ''.join(lines).encode(self.charset)
+
+
+class NDJSONRenderer(StreamingRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render_row(self, fields, row):
+        return json.dumps(dict(zip(fields, row)), cls=JSONEncoder) + '\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (json.dumps(data, cls=JSONEncoder) + '\n').encode(self.charset)
+
+
+class LineBuffer(object):
+    """
+    A file-like object whose write returns the line written, so the csv
+    module can format one row at a time.
+    """
+    def write(self, line):
+        return line
+
+
+class CSVRenderer(StreamingRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def __init__(self):
+        self.writer = csv.writer(LineBuffer())
+
+    def render_header(self, fields):
+        return self.writer.writerow(fields)
+
+    def render_row(self, fields, row):
+        return self.writer.writerow(row)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # We render the error details as a header row and a values row
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        return b''.join(self.render_rows(
+            list(data.keys()),
+            [[str(value) for value in data.values()]]))
@@ -0,0 +1,64 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import random
+import threading
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+
+
+# Whether the reads of the request in each thread may go to a replica
+_state = threading.local()
+
+
+def get_read_replicas():
+    """
+    Return the aliases in GAMES_READ_REPLICAS that aren't the primary
+    database under another alias, such as the test mirrors.
+    """
+    primary_name = connections.databases[DEFAULT_DB_ALIAS]['NAME']
+    return [
+        alias for alias in getattr(settings, 'GAMES_READ_REPLICAS', [])
+        if connections.databases[alias]['NAME'] != primary_name]
+
+
+def use_replicas(enabled):
+    """
+    Send the reads of the current thread to the read replicas, or stop
+    doing so. Threads start reading from the primary database.
+    """
+    _state.use_replicas = enabled
+
+
+def is_using_replicas():
+    return getattr(_state, 'use_replicas', False)
+
+
+class ReadReplicaRouter(object):
+    """
+    Sends reads to a random database in GAMES_READ_REPLICAS while the
+    thread serves a safe request, and everything else to the primary.
+    The first write pins the rest of the request to the primary, so it
+    reads what it wrote.
+    """
+    def db_for_read(self, model, **hints):
+        replicas = get_read_replicas()
+        if replicas and is_using_replicas():
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        use_replicas(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, they are never migrated
+        return db not in getattr(settings, 'GAMES_READ_REPLICAS', [])
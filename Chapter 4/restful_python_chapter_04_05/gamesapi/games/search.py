@@ -0,0 +1,140 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import re
+from django.db import connections
+from rest_framework import filters
+from games.models import GameCategory
+from games.models import Game
+from games.models import Player
+
+
+# The SQLite FTS5 table that indexes the names of each model. The tables
+# are created by the 0009_name_search migration when FTS5 is available.
+SEARCH_TABLES = {
+    GameCategory: 'games_gamecategory_search',
+    Game: 'games_game_search',
+    Player: 'games_player_search',
+}
+
+
+def get_search_table(model, using):
+    """
+    Return the FTS5 table that indexes the names of the model in the
+    database, or None when the database has no such table. The tables of
+    each connection are looked up once for each database name.
+    """
+    table = SEARCH_TABLES.get(model)
+    if table is None:
+        return None
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return None
+    name = connection.settings_dict['NAME']
+    cached = getattr(connection, '_search_tables', None)
+    if cached is None or cached[0] != name:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' "
+                "AND name LIKE 'games\\_%\\_search' ESCAPE '\\'")
+            cached = (name, set(row[0] for row in cursor.fetchall()))
+        connection._search_tables = cached
+    return table if table in cached[1] else None
+
+
+def get_match_query(terms):
+    """
+    Return the FTS5 query that matches the names with a token starting
+    with each of the terms. Only the word characters of the terms are
+    kept, so they can't use the FTS5 query syntax.
+    """
+    tokens = []
+    for term in terms:
+        tokens.extend(re.findall(r'\w+', term))
+    return ' '.join('"{0}"*'.format(token) for token in tokens)
+
+
+def index_object(instance, using):
+    table = get_search_table(type(instance), using)
+    if table is None:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM {0} WHERE rowid = %s'.format(table), [instance.pk])
+        cursor.execute(
+            'INSERT INTO {0} (rowid, name) VALUES (%s, %s)'.format(table),
+            [instance.pk, instance.name])
+
+
+def unindex_object(instance, using):
+    table = get_search_table(type(instance), using)
+    if table is None:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM {0} WHERE rowid = %s'.format(table), [instance.pk])
+
+
+def unindex_queryset(queryset):
+    """
+    Remove the rows of the queryset from the index with one statement,
+    for the bulk deletes that don't send post_delete.
+    """
+    table = get_search_table(queryset.model, queryset.db)
+    if table is None:
+        return
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM {0} WHERE rowid IN ({1})'.format(table, sql), params)
+
+
+def rebuild_search_index(using='default'):
+    """
+    Index the names of every row again, after rows were inserted in bulk.
+    """
+    for model in SEARCH_TABLES:
+        table = get_search_table(model, using)
+        if table is None:
+            continue
+        with connections[using].cursor() as cursor:
+            cursor.execute('DELETE FROM {0}'.format(table))
+            cursor.execute(
+                'INSERT INTO {0} (rowid, name) SELECT {1}, name FROM {2}'.format(
+                    table, model._meta.pk.column, model._meta.db_table))
+            # Merge the b-trees the inserts created into one
+            cursor.execute(
+                "INSERT INTO {0} ({0}) VALUES ('optimize')".format(table))
+
+
+class NameSearchFilter(filters.SearchFilter):
+    """
+    Searches the names of the models in SEARCH_TABLES with their FTS5
+    index. Each search term matches the names with a word that starts
+    with it, such as "mar" for "Super Mario". Other models and databases
+    without the index use the search_fields of the view. Like with
+    SearchFilter, views without search_fields aren't searched.
+    """
+    def filter_queryset(self, request, queryset, view):
+        if not getattr(view, 'search_fields', None):
+            return queryset
+        table = get_search_table(queryset.model, queryset.db)
+        if table is None:
+            return super(NameSearchFilter, self).filter_queryset(
+                request, queryset, view)
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        query = get_match_query(terms)
+        if not query:
+            # Terms without words match no name
+            return queryset.none()
+        return queryset.extra(
+            where=['{0}.{1} IN (SELECT rowid FROM {2} WHERE {2} MATCH %s)'.format(
+                queryset.model._meta.db_table,
+                queryset.model._meta.pk.column,
+                table)],
+            params=[query])
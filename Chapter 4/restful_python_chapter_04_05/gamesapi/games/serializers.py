@@ -4,15 +4,28 @@ Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
 Author: Gaston C. Hillar - Twitter.com/gastonhillar
 Publisher: Packt Publishing Ltd. - http://www.packtpub.com
 """
+from django.conf import settings
+from django.db import connection
+from django.db import transaction
 from rest_framework import serializers
+from games import leaderboards
+from games.compiled import CompiledRepresentationMixin
+from games.conditional import bump_model_version
+from games.stats import invalidate_stats
+from games.hyperlinks import TemplatedHyperlinkedIdentityField
+from games.hyperlinks import TemplatedHyperlinkedModelSerializer
+from games.hyperlinks import TemplatedHyperlinkedRelatedField
 from games.models import GameCategory
 from games.models import Game
 from games.models import Player
 from games.models import PlayerScore
+from games.models import LeaderboardEntry
+from games.nested import BoundedNestedField
+from games.nested import BoundedNestedListSerializer
 from django.contrib.auth.models import User
 
 
-class UserGameSerializer(serializers.HyperlinkedModelSerializer):
+class UserGameSerializer(TemplatedHyperlinkedModelSerializer):
     class Meta:
         model = Game
         fields = (
@@ -20,11 +33,17 @@ class UserGameSerializer(serializers.HyperlinkedModelSerializer):
             'name')
 
 
-class UserSerializer(serializers.HyperlinkedModelSerializer):
-    games = UserGameSerializer(many=True, read_only=True)
+class UserSerializer(TemplatedHyperlinkedModelSerializer):
+    # Heavy owners would produce huge responses, so we only nest the
+    # first games with their count and a link to the owner's games
+    games = BoundedNestedField(
+        child=UserGameSerializer(),
+        list_view_name='game-list',
+        filter_name='owner')
 
     class Meta:
         model = User
+        list_serializer_class = BoundedNestedListSerializer
         fields = (
             'url', 
             'pk',
@@ -32,14 +51,17 @@ class UserSerializer(serializers.HyperlinkedModelSerializer):
             'games')
 
 
-class GameCategorySerializer(serializers.HyperlinkedModelSerializer):
-    games = serializers.HyperlinkedRelatedField(
-        many=True,
-        read_only=True,
-        view_name='game-detail')
+class GameCategorySerializer(TemplatedHyperlinkedModelSerializer):
+    games = BoundedNestedField(
+        child=TemplatedHyperlinkedRelatedField(
+            read_only=True,
+            view_name='game-detail'),
+        list_view_name='game-list',
+        filter_name='game_category')
 
     class Meta:
         model = GameCategory
+        list_serializer_class = BoundedNestedListSerializer
         fields = (
             'url',
             'pk',
@@ -47,7 +69,8 @@ class GameCategorySerializer(serializers.HyperlinkedModelSerializer):
             'games')
 
 
-class GameSerializer(serializers.HyperlinkedModelSerializer):
+class GameSerializer(CompiledRepresentationMixin,
+                     TemplatedHyperlinkedModelSerializer):
     # We just want to display the owner username (read-only)
     owner = serializers.ReadOnlyField(source='owner.username')
     # We want to display the game cagory's name instead of the id
@@ -65,7 +88,12 @@ class GameSerializer(serializers.HyperlinkedModelSerializer):
                 'played')
 
 
-class ScoreSerializer(serializers.HyperlinkedModelSerializer):
+class GameBulkUpdateSerializer(serializers.Serializer):
+    # The fields a bulk PATCH of the games list may set
+    played = serializers.BooleanField()
+
+
+class ScoreSerializer(TemplatedHyperlinkedModelSerializer):
     # We want to display all the details for the game
     game = GameSerializer()
     # We don't include the player because it will be nested in the player
@@ -80,7 +108,8 @@ class ScoreSerializer(serializers.HyperlinkedModelSerializer):
             )
 
 
-class PlayerSerializer(serializers.HyperlinkedModelSerializer):
+class PlayerSerializer(CompiledRepresentationMixin,
+                       TemplatedHyperlinkedModelSerializer):
     scores = ScoreSerializer(many=True, read_only=True)
     gender = serializers.ChoiceField(
         choices=Player.GENDER_CHOICES)
@@ -99,7 +128,9 @@ class PlayerSerializer(serializers.HyperlinkedModelSerializer):
             )
 
 
-class PlayerScoreSerializer(serializers.ModelSerializer):
+class PlayerScoreSerializer(CompiledRepresentationMixin,
+                            serializers.ModelSerializer):
+    serializer_url_field = TemplatedHyperlinkedIdentityField
     player = serializers.SlugRelatedField(queryset=Player.objects.all(), slug_field='name')
     # We want to display the game's name instead of the id
     game = serializers.SlugRelatedField(queryset=Game.objects.all(), slug_field='name')
@@ -114,3 +145,108 @@ class PlayerScoreSerializer(serializers.ModelSerializer):
             'player',
             'game',
             )
+
+
+def get_pks_by_name(model, names):
+    """
+    Return a dict that maps each existing name to its primary key.
+    """
+    names = list(names)
+    # SQLite limits the number of variables in a query
+    chunk_size = 999 if connection.vendor == 'sqlite' else len(names) or 1
+    pks = {}
+    for start in range(0, len(names), chunk_size):
+        pks.update(model.objects.filter(
+            name__in=names[start:start + chunk_size]).values_list('name', 'pk'))
+    return pks
+
+
+class PlayerScoreBulkListSerializer(serializers.ListSerializer):
+    does_not_exist_message = 'Object with name={0} does not exist.'
+
+    def to_internal_value(self, data):
+        limit = getattr(settings, 'GAMES_BULK_SCORES_LIMIT', 10000)
+        if isinstance(data, list) and len(data) > limit:
+            raise serializers.ValidationError({
+                'non_field_errors': [
+                    'Ensure there are no more than {0} scores.'.format(limit)]
+            })
+        player_scores = super(
+            PlayerScoreBulkListSerializer, self).to_internal_value(data)
+        # We resolve all the names with one query for each model
+        player_pks = get_pks_by_name(
+            Player, set(item['player'] for item in player_scores))
+        game_pks = get_pks_by_name(
+            Game, set(item['game'] for item in player_scores))
+        errors = []
+        for item in player_scores:
+            error = {}
+            for field_name, pks in (('player', player_pks), ('game', game_pks)):
+                if item[field_name] in pks:
+                    item[field_name + '_id'] = pks[item[field_name]]
+                else:
+                    error[field_name] = [
+                        self.does_not_exist_message.format(item[field_name])]
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return player_scores
+
+    def create(self, validated_data):
+        player_scores = [
+            PlayerScore(
+                player_id=item['player_id'],
+                game_id=item['game_id'],
+                score=item['score'],
+                score_date=item['score_date'])
+            for item in validated_data]
+        with transaction.atomic():
+            PlayerScore.objects.bulk_create(player_scores)
+            # bulk_create doesn't send the post_save signal
+            for game_id in set(item['game_id'] for item in validated_data):
+                leaderboards.refresh_game_leaderboard(game_id)
+            bump_model_version(PlayerScore)
+            invalidate_stats(
+                'player', [item['player_id'] for item in validated_data])
+            invalidate_stats(
+                'game', [item['game_id'] for item in validated_data])
+        return player_scores
+
+
+class PlayerScoreBulkSerializer(serializers.ModelSerializer):
+    # Names are resolved for the whole list by the list serializer
+    player = serializers.CharField(max_length=50)
+    game = serializers.CharField(max_length=200)
+
+    class Meta:
+        model = PlayerScore
+        list_serializer_class = PlayerScoreBulkListSerializer
+        fields = (
+            'score',
+            'score_date',
+            'player',
+            'game',
+            )
+
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    # The rank is assigned by the view, entries are already sorted
+    rank = serializers.IntegerField(read_only=True)
+    player_score = TemplatedHyperlinkedRelatedField(
+        read_only=True,
+        view_name='playerscore-detail')
+    # We want to display the player's name instead of the id
+    player = serializers.ReadOnlyField(source='player_score.player.name')
+    score_date = serializers.DateTimeField(
+        source='player_score.score_date',
+        read_only=True)
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = (
+            'rank',
+            'player_score',
+            'player',
+            'score',
+            'score_date',
+            )
@@ -0,0 +1,107 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_save
+from django.contrib.auth.models import User
+from django.dispatch import receiver
+from games import leaderboards
+from games.autocomplete import index_name
+from games.autocomplete import unindex_name
+from games.conditional import bump_model_version
+from games.models import GameCategory
+from games.models import Game
+from games.models import Player
+from games.models import PlayerScore
+from games.search import index_object
+from games.search import unindex_object
+from games.sqlite import apply_sqlite_pragmas
+from games.stats import invalidate_stats
+
+
+@receiver(pre_save, sender=PlayerScore)
+def player_score_saving(sender, instance, raw, **kwargs):
+    # An updated score may move away from its player or game
+    if raw or instance.pk is None:
+        return
+    instance.previous_ids = PlayerScore.objects.filter(
+        pk=instance.pk).values_list('player_id', 'game_id').first()
+
+
+@receiver(post_save, sender=PlayerScore)
+def player_score_saved(sender, instance, created, raw, **kwargs):
+    # Fixtures are loaded as is, run rebuild_leaderboards after loading them
+    if raw:
+        return
+    if created:
+        leaderboards.add_player_score(instance)
+    else:
+        leaderboards.update_player_score(instance)
+    player_ids = [instance.player_id]
+    game_ids = [instance.game_id]
+    previous_ids = getattr(instance, 'previous_ids', None)
+    if previous_ids is not None:
+        player_ids.append(previous_ids[0])
+        game_ids.append(previous_ids[1])
+    invalidate_stats('player', player_ids)
+    invalidate_stats('game', game_ids)
+
+
+@receiver(post_delete, sender=PlayerScore)
+def player_score_deleted(sender, instance, **kwargs):
+    leaderboards.remove_player_score(instance)
+    invalidate_stats('player', [instance.player_id])
+    invalidate_stats('game', [instance.game_id])
+
+
+@receiver(post_delete, sender=Game)
+@receiver(post_delete, sender=Player)
+def stats_row_deleted(sender, instance, **kwargs):
+    # The stats of a deleted row aren't found anymore
+    invalidate_stats(sender._meta.model_name, [instance.pk])
+
+
+@receiver(post_save, sender=GameCategory)
+@receiver(post_save, sender=Game)
+@receiver(post_save, sender=Player)
+def name_saved(sender, instance, raw, using, **kwargs):
+    # Fixtures are loaded as is, run rebuild_search_index after loading them
+    if raw:
+        return
+    index_object(instance, using)
+    index_name(instance)
+
+
+@receiver(post_delete, sender=GameCategory)
+@receiver(post_delete, sender=Game)
+@receiver(post_delete, sender=Player)
+def name_deleted(sender, instance, using, **kwargs):
+    unindex_object(instance, using)
+    unindex_name(instance)
+
+
+@receiver(post_save, sender=GameCategory)
+@receiver(post_delete, sender=GameCategory)
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+@receiver(post_save, sender=Player)
+@receiver(post_delete, sender=Player)
+@receiver(post_save, sender=PlayerScore)
+@receiver(post_delete, sender=PlayerScore)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def model_changed(sender, **kwargs):
+    # Conditional GET responses that read this model are stale
+    bump_model_version(sender)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    # Every worker connection gets the configured pragmas once
+    if connection.vendor == 'sqlite':
+        apply_sqlite_pragmas(connection)
@@ -0,0 +1,30 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import re
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def get_sqlite_pragmas():
+    return getattr(settings, 'GAMES_SQLITE_PRAGMAS', {})
+
+
+def apply_sqlite_pragmas(connection):
+    """
+    Run the GAMES_SQLITE_PRAGMAS statements on a new SQLite connection.
+    The busy timeout goes first, changing the journal mode may have to
+    wait for other connections.
+    """
+    pragmas = get_sqlite_pragmas()
+    names = sorted(pragmas, key=lambda name: name != 'busy_timeout')
+    with connection.cursor() as cursor:
+        for name in names:
+            value = pragmas[name]
+            if not re.match(r'^\w+$', name) or not re.match(r'^-?\w+$', str(value)):
+                raise ImproperlyConfigured(
+                    'Invalid SQLite pragma {0}={1}.'.format(name, value))
+            cursor.execute('PRAGMA {0}={1}'.format(name, value))
@@ -0,0 +1,177 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.db import router
+from django.db import transaction
+from django.db.models import Avg
+from django.db.models import CharField
+from django.db.models import Count
+from django.db.models import ExpressionWrapper
+from django.db.models import F
+from django.db.models import IntegerField
+from django.db.models import Max
+from django.db.models import Min
+from django.db.models import Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+from games.models import Game
+from games.models import ModelVersion
+from games.models import Player
+from games.models import PlayerScore
+
+
+def get_stats_label(kind, pk=''):
+    return 'games.stats.{0}.{1}'.format(kind, pk)
+
+
+def get_stats_version(kind, pk):
+    """
+    Return the version of the stats of the row. The writes only bump the
+    versions that exist, so the version is created before the stats are
+    computed and cached under it.
+    """
+    label = get_stats_label(kind, pk)
+    versions = list(ModelVersion.objects.filter(
+        label=label).values_list('version', flat=True))
+    if versions:
+        return versions[0]
+    try:
+        with transaction.atomic(using=router.db_for_write(ModelVersion)):
+            ModelVersion.objects.create(
+                label=label, version=0, modified=timezone.now())
+    except IntegrityError:
+        # Another request created the version first, the stats it
+        # computes may be newer, so this request doesn't cache them
+        return None
+    return 0
+
+
+def bump_stats_versions(versions):
+    versions.update(version=F('version') + 1, modified=timezone.now())
+
+
+def invalidate_stats(kind, pks):
+    """
+    Expire the cached stats of the rows with the primary keys, like the
+    players and the game of a saved score.
+    """
+    bump_stats_versions(ModelVersion.objects.filter(label__in=[
+        get_stats_label(kind, pk) for pk in set(pks)]))
+
+
+def invalidate_queryset_stats(kind, queryset, field):
+    """
+    Expire the cached stats of the rows whose primary keys are in the
+    field of the queryset with one statement, for the bulk writes that
+    don't send signals.
+    """
+    labels = queryset.order_by().annotate(stats_label=Concat(
+        Value(get_stats_label(kind)), field,
+        output_field=CharField())).values('stats_label')
+    bump_stats_versions(ModelVersion.objects.filter(label__in=labels))
+
+
+def get_histogram_buckets():
+    return getattr(settings, 'GAMES_STATS_HISTOGRAM_BUCKETS', 10)
+
+
+def get_cached_stats(kind, pk, compute):
+    """
+    Return the stats computed for the row from the cache, or compute
+    and cache them. They are cached until the version of the stats of
+    the row is bumped, by a write to its scores or its deletion in any
+    process. Nothing is cached for missing rows.
+    """
+    version = get_stats_version(kind, pk)
+    cache_key = 'games:stats:{0}:{1}:{2}'.format(kind, pk, version)
+    stats = None if version is None else cache.get(cache_key)
+    if stats is None:
+        stats = compute(pk)
+        if stats is not None and version is not None:
+            cache.set(
+                cache_key,
+                stats,
+                getattr(settings, 'GAMES_STATS_CACHE_TIMEOUT', 300))
+    return stats
+
+
+def compute_player_stats(pk):
+    aggregates = PlayerScore.objects.filter(player_id=pk).aggregate(
+        scores_count=Count('pk'),
+        games_count=Count('game', distinct=True),
+        best_score=Max('score'),
+        average_score=Avg('score'),
+        last_score_date=Max('score_date'))
+    if not aggregates['scores_count'] and not Player.objects.filter(
+            pk=pk).exists():
+        return None
+    return OrderedDict((name, aggregates[name]) for name in (
+        'scores_count',
+        'games_count',
+        'best_score',
+        'average_score',
+        'last_score_date',
+        ))
+
+
+def get_histogram(scores, lowest, highest):
+    """
+    Return the number of scores in each of the equal width buckets
+    between the lowest and the highest score, counted with one grouped
+    query.
+    """
+    buckets = get_histogram_buckets()
+    width = max(1, -(-(highest - lowest + 1) // buckets))
+    counts = dict(scores.annotate(
+        bucket=ExpressionWrapper(
+            (F('score') - lowest) / width, output_field=IntegerField())
+        ).values('bucket').annotate(count=Count('pk')).order_by(
+            'bucket').values_list('bucket', 'count'))
+    return [
+        OrderedDict((
+            ('from', lowest + bucket * width),
+            ('to', lowest + (bucket + 1) * width - 1),
+            ('count', counts.get(bucket, 0)),
+            ))
+        for bucket in range((highest - lowest) // width + 1)]
+
+
+def compute_game_stats(pk):
+    scores = PlayerScore.objects.filter(game_id=pk)
+    aggregates = scores.aggregate(
+        scores_count=Count('pk'),
+        players_count=Count('player', distinct=True),
+        best_score=Max('score'),
+        worst_score=Min('score'),
+        average_score=Avg('score'))
+    if not aggregates['scores_count']:
+        if not Game.objects.filter(pk=pk).exists():
+            return None
+        histogram = []
+    else:
+        histogram = get_histogram(
+            scores, aggregates['worst_score'], aggregates['best_score'])
+    stats = OrderedDict((name, aggregates[name]) for name in (
+        'scores_count',
+        'players_count',
+        'best_score',
+        'worst_score',
+        'average_score',
+        ))
+    stats['histogram'] = histogram
+    return stats
+
+
+def get_player_stats(pk):
+    return get_cached_stats('player', pk, compute_player_stats)
+
+
+def get_game_stats(pk):
+    return get_cached_stats('game', pk, compute_game_stats)
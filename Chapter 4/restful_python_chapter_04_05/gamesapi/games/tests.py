@@ -4,13 +4,104 @@ Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
 Author: Gaston C. Hillar - Twitter.com/gastonhillar
 Publisher: Packt Publishing Ltd. - http://www.packtpub.com
 """
+import asyncio
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+from collections import OrderedDict
+from datetime import date
+from datetime import datetime
+from decimal import Decimal
+from io import BytesIO
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from django.test import RequestFactory
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.exceptions import ImproperlyConfigured
 from django.core.urlresolvers import reverse
+from django.http import HttpResponse
+from django.contrib.auth.models import User
+from django.db.models import Count
+from django.utils import timezone
 from django.utils.http import urlencode
+from django.utils.timezone import utc
+from django.utils.translation import ugettext_lazy
+from rest_framework import relations
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.relations import Hyperlink
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
+from rest_framework.throttling import SimpleRateThrottle
+from games import benchmarks
+from games.benchmarks import load
+from games import views
+from games.management.commands.benchmark_indexes import get_cases
+from games.management.commands.benchmark_indexes import get_main_query
+from games.management.commands.sync_sqlite_replica import copy_sqlite_database
 from games.models import GameCategory
+from games.models import Game
 from games.models import Player
+from games.models import PlayerScore
+from games.models import LeaderboardEntry
+from games.filters import get_name_choices
+from games.asgi import ASGIHandler
+from games.autocomplete import NAME_INDEXES
+from games.asgi import get_environ
+from games.hyperlinks import HyperlinkTemplateMixin
+from games.nested import fetch_bounded_rows
+from games.middleware import ReadReplicaMiddleware
+from games.routers import ReadReplicaRouter
+from games.search import get_match_query
+from games.stats import invalidate_stats
+from games.parsers import FastJSONParser
+from games.renderers import FastJSONRenderer
+from games.authentication import CachedBasicAuthentication
+from games.authentication import verified_credentials
+from games.throttling import TokenBucketStore
+from games.throttling import token_buckets
+
+
+# The throttles of the tests never reject a request and keep their token
+# buckets in memory, SharedRateThrottleTests checks the configured rates
+unthrottled = benchmarks.unthrottled()
+
+
+def setUpModule():
+    unthrottled.__enter__()
+
+
+def tearDownModule():
+    unthrottled.__exit__(None, None, None)
+
+
+class GameFixtureTestCase(APITestCase):
+    """
+    Creates the owner and the game category of the games that the tests
+    create with create_game.
+    """
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            'owner', 'owner@example.com', 'password')
+        self.game_category = GameCategory.objects.create(name='Category')
+
+    def create_game(self, name, **fields):
+        fields.setdefault('owner', self.owner)
+        fields.setdefault('game_category', self.game_category)
+        fields.setdefault('release_date', timezone.now())
+        return Game.objects.create(name=name, **fields)
 
 
 class PlayerTests(APITestCase):
@@ -245,3 +336,1830 @@ class GameCategoryTests(APITestCase):
         self.assertEqual(
             response.data['results'][0]['name'],
             game_category_name1)
+
+
+class QueryCountTests(APITestCase):
+    def setUp(self):
+        now = timezone.now()
+        for user_number in range(3):
+            owner = User.objects.create_user(
+                'owner{0}'.format(user_number),
+                'owner{0}@example.com'.format(user_number),
+                'password')
+            game_category = GameCategory.objects.create(
+                name='Category {0}'.format(user_number))
+            for game_number in range(3):
+                Game.objects.create(
+                    owner=owner,
+                    name='Game {0}-{1}'.format(user_number, game_number),
+                    game_category=game_category,
+                    release_date=now)
+        for player_number in range(4):
+            player = Player.objects.create(
+                name='Player {0}'.format(player_number))
+            for score_number, game in enumerate(Game.objects.all()):
+                PlayerScore.objects.create(
+                    player=player,
+                    game=game,
+                    score=player_number * 100 + score_number,
+                    score_date=now)
+
+    def assert_get_num_queries(self, num, url):
+        # The first query retrieves the model versions for the ETag
+        with self.assertNumQueries(num):
+            response = self.client.get(url, format='json')
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK)
+        return response
+
+    def test_players_list_num_queries(self):
+        """
+        Ensure the players list runs a fixed number of queries
+        """
+        response = self.assert_get_num_queries(4, reverse('player-list'))
+        self.assertEqual(
+            len(response.data['results'][0]['scores']),
+            9)
+
+    def test_player_detail_num_queries(self):
+        """
+        Ensure the player detail runs a fixed number of queries
+        """
+        url = reverse(
+            'player-detail',
+            None,
+            {Player.objects.first().pk})
+        self.assert_get_num_queries(3, url)
+
+    def test_games_list_num_queries(self):
+        """
+        Ensure the games list runs a fixed number of queries
+        """
+        self.assert_get_num_queries(3, reverse('game-list'))
+
+    def test_game_detail_num_queries(self):
+        """
+        Ensure the game detail runs a fixed number of queries
+        """
+        url = reverse(
+            'game-detail',
+            None,
+            {Game.objects.first().pk})
+        self.assert_get_num_queries(2, url)
+
+    def test_game_categories_list_num_queries(self):
+        """
+        Ensure the game categories list runs a fixed number of queries
+        """
+        self.assert_get_num_queries(4, reverse('gamecategory-list'))
+
+    def test_game_category_detail_num_queries(self):
+        """
+        Ensure the game category detail runs a fixed number of queries
+        """
+        url = reverse(
+            'gamecategory-detail',
+            None,
+            {GameCategory.objects.first().pk})
+        self.assert_get_num_queries(3, url)
+
+    def test_player_scores_list_num_queries(self):
+        """
+        Ensure the player scores list runs a fixed number of queries
+        """
+        self.assert_get_num_queries(2, reverse('playerscore-list'))
+
+    def test_player_score_detail_num_queries(self):
+        """
+        Ensure the player score detail runs a fixed number of queries
+        """
+        url = reverse(
+            'playerscore-detail',
+            None,
+            {PlayerScore.objects.first().pk})
+        self.assert_get_num_queries(2, url)
+
+    def test_users_list_num_queries(self):
+        """
+        Ensure the users list runs a fixed number of queries
+        """
+        self.assert_get_num_queries(4, reverse('user-list'))
+
+    def test_user_detail_num_queries(self):
+        """
+        Ensure the user detail runs a fixed number of queries
+        """
+        url = reverse(
+            'user-detail',
+            None,
+            {User.objects.first().pk})
+        self.assert_get_num_queries(3, url)
+
+
+class PlayerScoreKeysetPaginationTests(GameFixtureTestCase):
+    def setUp(self):
+        super(PlayerScoreKeysetPaginationTests, self).setUp()
+        self.game = self.create_game('Game')
+        self.player = Player.objects.create(name='Player')
+        # Repeated scores and dates make the pk tie breaker matter
+        for score_number in range(12):
+            self.create_player_score(
+                score_number // 3,
+                timezone.now() - timezone.timedelta(days=score_number // 2))
+
+    def create_player_score(self, score, score_date):
+        return PlayerScore.objects.create(
+            player=self.player,
+            game=self.game,
+            score=score,
+            score_date=score_date)
+
+    def get(self, url):
+        return self.client.get(url, format='json')
+
+    def get_pages(self, url, link):
+        pages = []
+        while url:
+            response = self.get(url)
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_200_OK)
+            pages.append([score['pk'] for score in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def test_walk_pages_ordered_by_score(self):
+        """
+        Ensure we can walk all the score pages forward and backward
+        """
+        expected_pks = list(PlayerScore.objects.order_by(
+            '-score', '-pk').values_list('pk', flat=True))
+        pages = self.get_pages(reverse('playerscore-list'), 'next')
+        self.assertEqual(
+            [len(page) for page in pages],
+            [5, 5, 2])
+        self.assertEqual(
+            sum(pages, []),
+            expected_pks)
+        last_page_url = self.get(reverse('playerscore-list')).data['next']
+        last_page_url = self.get(last_page_url).data['next']
+        previous_pages = self.get_pages(last_page_url, 'previous')
+        self.assertEqual(
+            previous_pages,
+            list(reversed(pages)))
+
+    def test_walk_pages_ordered_by_score_date(self):
+        """
+        Ensure we can walk the score pages ordered by score date
+        """
+        expected_pks = list(PlayerScore.objects.order_by(
+            'score_date', 'pk').values_list('pk', flat=True))
+        url = '{0}?{1}'.format(
+            reverse('playerscore-list'),
+            urlencode({'ordering': 'score_date'}))
+        pages = self.get_pages(url, 'next')
+        self.assertEqual(
+            sum(pages, []),
+            expected_pks)
+
+    def test_inserted_score_does_not_shift_pages(self):
+        """
+        Ensure a score inserted while paging doesn't shift the next page
+        """
+        response = self.get(reverse('playerscore-list'))
+        first_page_pks = [score['pk'] for score in response.data['results']]
+        self.create_player_score(100, timezone.now())
+        next_response = self.get(response.data['next'])
+        expected_pks = list(PlayerScore.objects.exclude(
+            score=100).order_by('-score', '-pk').values_list('pk', flat=True))
+        self.assertEqual(
+            [score['pk'] for score in next_response.data['results']],
+            expected_pks[len(first_page_pks):len(first_page_pks) + 5])
+
+    def test_invalid_cursor(self):
+        """
+        Ensure we get a not found response for an invalid cursor
+        """
+        url = '{0}?{1}'.format(
+            reverse('playerscore-list'),
+            urlencode({'cursor': 'invalid'}))
+        response = self.get(url)
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(GAMES_LEADERBOARD_SIZE=3)
+class GameLeaderboardTests(GameFixtureTestCase):
+    def setUp(self):
+        super(GameLeaderboardTests, self).setUp()
+        self.game = self.create_game('Game')
+        self.other_game = self.create_game('Other Game')
+        self.player = Player.objects.create(name='Player')
+
+    def create_player_score(self, score, game=None):
+        return PlayerScore.objects.create(
+            player=self.player,
+            game=game or self.game,
+            score=score,
+            score_date=timezone.now())
+
+    def get_leaderboard_scores(self, game=None):
+        url = reverse(
+            'game-leaderboard',
+            None,
+            {(game or self.game).pk})
+        response = self.client.get(url, format='json')
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK)
+        return [(entry['rank'], entry['score']) for entry in response.data]
+
+    def test_retrieve_game_leaderboard(self):
+        """
+        Ensure we retrieve the top scores for a game ranked
+        """
+        for score in (10, 40, 20, 30, 40):
+            self.create_player_score(score)
+        self.create_player_score(50, self.other_game)
+        self.assertEqual(
+            self.get_leaderboard_scores(),
+            [(1, 40), (2, 40), (3, 30)])
+        self.assertEqual(
+            LeaderboardEntry.objects.filter(game=self.game).count(),
+            3)
+
+    def test_update_and_delete_leaderboard_scores(self):
+        """
+        Ensure the leaderboard follows updated and deleted scores
+        """
+        player_scores = [
+            self.create_player_score(score)
+            for score in (10, 20, 30, 40)]
+        player_scores[3].score = 5
+        player_scores[3].save()
+        self.assertEqual(
+            self.get_leaderboard_scores(),
+            [(1, 30), (2, 20), (3, 10)])
+        player_scores[0].score = 35
+        player_scores[0].save()
+        self.assertEqual(
+            self.get_leaderboard_scores(),
+            [(1, 35), (2, 30), (3, 20)])
+        player_scores[2].delete()
+        self.assertEqual(
+            self.get_leaderboard_scores(),
+            [(1, 35), (2, 20), (3, 5)])
+        player_scores[0].game = self.other_game
+        player_scores[0].save()
+        self.assertEqual(
+            self.get_leaderboard_scores(),
+            [(1, 20), (2, 5)])
+        self.assertEqual(
+            self.get_leaderboard_scores(self.other_game),
+            [(1, 35)])
+
+    def test_retrieve_missing_game_leaderboard(self):
+        """
+        Ensure we get a not found response for a missing game
+        """
+        url = reverse('game-leaderboard', None, {0})
+        response = self.client.get(url, format='json')
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_404_NOT_FOUND)
+
+    def test_rebuild_leaderboards(self):
+        """
+        Ensure the rebuild_leaderboards command recreates the entries
+        """
+        for score in (10, 20, 30, 40):
+            self.create_player_score(score)
+        LeaderboardEntry.objects.all().delete()
+        call_command('rebuild_leaderboards', stdout=StringIO())
+        self.assertEqual(
+            self.get_leaderboard_scores(),
+            [(1, 40), (2, 30), (3, 20)])
+
+
+class PlayerScoreFilterTests(GameFixtureTestCase):
+    def setUp(self):
+        super(PlayerScoreFilterTests, self).setUp()
+        for number in range(2):
+            game = self.create_game('Game {0}'.format(number))
+            player = Player.objects.create(
+                name='Player {0}'.format(number))
+            PlayerScore.objects.create(
+                player=player,
+                game=game,
+                score=number,
+                score_date=timezone.now())
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_filtered_scores(self, filter_by):
+        url = '{0}?{1}'.format(
+            reverse('playerscore-list'),
+            urlencode(filter_by))
+        response = self.client.get(url, format='json')
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK)
+        return response.data['results']
+
+    def test_filter_player_scores_by_player_and_game_name(self):
+        """
+        Ensure we can filter player scores by player and game name
+        """
+        with self.assertNumQueries(4):
+            results = self.get_filtered_scores({
+                'player_name': 'Player 1',
+                'game_name': 'Game 1',
+                })
+        self.assertEqual(
+            [(score['player'], score['game']) for score in results],
+            [('Player 1', 'Game 1')])
+        self.assertEqual(
+            self.get_filtered_scores({'player_name': 'Missing Player'}),
+            [])
+
+    def test_name_choices_cache(self):
+        """
+        Ensure the cached name choices are invalidated by player writes
+        """
+        self.assertEqual(
+            get_name_choices(Player),
+            ['Player 0', 'Player 1'])
+        # Only the model version is read
+        with self.assertNumQueries(1):
+            get_name_choices(Player)
+        with self.settings(GAMES_NAME_CHOICES_LIMIT=2):
+            Player.objects.create(name='A Player')
+            self.assertEqual(
+                get_name_choices(Player),
+                ['A Player', 'Player 0'])
+
+
+class CachedBasicAuthenticationTests(APITestCase):
+    def setUp(self):
+        verified_credentials.clear()
+        self.user = User.objects.create_user(
+            'user', 'user@example.com', 'password')
+        self.authentication = CachedBasicAuthentication()
+
+    def test_cache_verified_credentials(self):
+        """
+        Ensure verified credentials are cached and invalid ones aren't
+        """
+        user, auth = self.authentication.authenticate_credentials(
+            'user', 'password')
+        self.assertEqual(user, self.user)
+        self.assertEqual(len(verified_credentials.entries), 1)
+        with self.assertNumQueries(1):
+            user, auth = self.authentication.authenticate_credentials(
+                'user', 'password')
+        self.assertEqual(user, self.user)
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(
+                'user', 'wrong password')
+        self.assertEqual(len(verified_credentials.entries), 1)
+
+    def test_password_change_invalidates_credentials(self):
+        """
+        Ensure cached credentials stop working after a password change
+        """
+        self.authentication.authenticate_credentials('user', 'password')
+        self.user.set_password('new password')
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials('user', 'password')
+        user, auth = self.authentication.authenticate_credentials(
+            'user', 'new password')
+        self.assertEqual(user, self.user)
+
+    def test_deactivation_invalidates_credentials(self):
+        """
+        Ensure cached credentials stop working for a deactivated user
+        """
+        self.authentication.authenticate_credentials('user', 'password')
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials('user', 'password')
+
+    def test_cache_size_is_bounded(self):
+        """
+        Ensure the least recently used credentials are evicted
+        """
+        User.objects.create_user(
+            'other user', 'other_user@example.com', 'password')
+        with self.settings(GAMES_CREDENTIALS_CACHE_SIZE=1):
+            self.authentication.authenticate_credentials('user', 'password')
+            self.authentication.authenticate_credentials(
+                'other user', 'password')
+        self.assertEqual(
+            list(verified_credentials.entries),
+            [verified_credentials.get_key('other user', 'password')])
+
+
+@mock.patch.dict(
+    SimpleRateThrottle.THROTTLE_RATES,
+    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'])
+class SharedRateThrottleTests(APITestCase):
+    def setUp(self):
+        token_buckets.clear()
+
+    def test_anonymous_throttle_rate(self):
+        """
+        Ensure anonymous requests are throttled after the anon rate
+        """
+        url = reverse('player-list')
+        for number in range(5):
+            response = self.client.get(url, format='json')
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_200_OK)
+        response = self.client.get(url, format='json')
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_scoped_throttle_rate(self):
+        """
+        Ensure the game categories scope replaces the anon rate
+        """
+        url = reverse('gamecategory-list')
+        for number in range(30):
+            response = self.client.get(url, format='json')
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_200_OK)
+        response = self.client.get(url, format='json')
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_consume_all_buckets_or_none(self):
+        """
+        Ensure no token is taken when any of the buckets is empty
+        """
+        rate = 1 / 3600
+        self.assertEqual(
+            token_buckets.consume([('a', 1, rate), ('b', 2, rate)], now=0),
+            [None, None])
+        waits = token_buckets.consume(
+            [('a', 1, rate), ('b', 2, rate)], now=0)
+        self.assertAlmostEqual(waits[0], 3600)
+        self.assertIsNone(waits[1])
+        self.assertEqual(
+            token_buckets.consume([('b', 2, rate)], now=0),
+            [None])
+        self.assertEqual(
+            token_buckets.consume([('a', 1, rate)], now=3600),
+            [None])
+
+    def test_buckets_shared_by_stores(self):
+        """
+        Ensure stores using the same file share the buckets
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'throttle.sqlite3')
+            with self.settings(GAMES_THROTTLE_DATABASE=path):
+                first_store = TokenBucketStore()
+                second_store = TokenBucketStore()
+                self.assertEqual(
+                    first_store.consume([('key', 1, 1 / 3600)], now=0),
+                    [None])
+                self.assertIsNotNone(
+                    second_store.consume([('key', 1, 1 / 3600)], now=0)[0])
+
+
+class ConditionalGetTests(GameFixtureTestCase):
+    def setUp(self):
+        super(ConditionalGetTests, self).setUp()
+        self.player = Player.objects.create(name='Player')
+
+    def test_not_modified_player_list(self):
+        """
+        Ensure we get not modified until a player changes
+        """
+        url = reverse('player-list')
+        response = self.client.get(url, format='json')
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        # Only the model versions are retrieved
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.player.name = 'Updated Player'
+        self.player.save()
+        response = self.client.get(
+            url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_related_model_changes_player_detail(self):
+        """
+        Ensure a new score changes the tag of the player that nests it
+        """
+        url = reverse('player-detail', None, {self.player.pk})
+        etag = self.client.get(url, format='json')['ETag']
+        game = self.create_game('Game')
+        PlayerScore.objects.create(
+            player=self.player,
+            game=game,
+            score=10,
+            score_date=timezone.now())
+        response = self.client.get(
+            url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK)
+        self.assertEqual(len(response.data['scores']), 1)
+
+    def test_not_modified_since(self):
+        """
+        Ensure we get not modified for the last modified date
+        """
+        url = reverse('player-detail', None, {self.player.pk})
+        response = self.client.get(url, format='json')
+        response = self.client.get(
+            url,
+            format='json',
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_304_NOT_MODIFIED)
+
+
+@override_settings(GAMES_LEADERBOARD_SIZE=3)
+class PlayerScoreBulkCreateTests(GameFixtureTestCase):
+    def setUp(self):
+        super(PlayerScoreBulkCreateTests, self).setUp()
+        for number in range(2):
+            self.create_game('Game {0}'.format(number))
+            Player.objects.create(name='Player {0}'.format(number))
+
+    def post_player_scores(self, player_scores):
+        url = reverse('playerscore-bulk')
+        return self.client.post(url, player_scores, format='json')
+
+    def get_player_score_data(self, player, game, score):
+        return {
+            'player': player,
+            'game': game,
+            'score': score,
+            'score_date': '2016-09-01T10:00:00Z',
+            }
+
+    def test_bulk_create_player_scores(self):
+        """
+        Ensure we can create many player scores with a single request
+        """
+        player_scores = [
+            self.get_player_score_data(
+                'Player {0}'.format(number % 2),
+                'Game {0}'.format(number // 3 % 2),
+                number)
+            for number in range(10)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.post_player_scores(player_scores)
+        # We want a single query for each model, whatever the scores count
+        queries = [query['sql'] for query in context.captured_queries]
+        self.assertEqual(
+            len([sql for sql in queries if 'games_player"."name" IN' in sql]),
+            1)
+        self.assertEqual(
+            len([sql for sql in queries if 'games_game"."name" IN' in sql]),
+            1)
+        self.assertEqual(
+            len([sql for sql in queries if 'INTO "games_playerscore"' in sql]),
+            1)
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'created': 10})
+        self.assertEqual(PlayerScore.objects.count(), 10)
+        self.assertEqual(
+            list(LeaderboardEntry.objects.filter(
+                game__name='Game 0').values_list('score', flat=True)),
+            [8, 7, 6])
+
+    def test_bulk_create_player_scores_errors(self):
+        """
+        Ensure we get per item errors and no player score is created
+        """
+        response = self.post_player_scores([
+            self.get_player_score_data('Player 0', 'Game 0', 10),
+            self.get_player_score_data('Missing Player', 'Game 1', 20),
+            self.get_player_score_data('Player 1', 'Missing Game', 30),
+            ])
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(
+            response.data[1],
+            {'player': ['Object with name=Missing Player does not exist.']})
+        self.assertEqual(
+            response.data[2],
+            {'game': ['Object with name=Missing Game does not exist.']})
+        self.assertEqual(PlayerScore.objects.count(), 0)
+
+    def test_bulk_create_player_scores_limit(self):
+        """
+        Ensure we cannot post more player scores than the limit
+        """
+        with self.settings(GAMES_BULK_SCORES_LIMIT=1):
+            response = self.post_player_scores([
+                self.get_player_score_data('Player 0', 'Game 0', 10),
+                self.get_player_score_data('Player 1', 'Game 1', 20),
+                ])
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(PlayerScore.objects.count(), 0)
+
+
+class PlayerScoreExportTests(GameFixtureTestCase):
+    def setUp(self):
+        super(PlayerScoreExportTests, self).setUp()
+        game = self.create_game('Game')
+        player = Player.objects.create(name='Player')
+        self.player_scores = [
+            PlayerScore.objects.create(
+                player=player,
+                game=game,
+                score=score,
+                score_date=timezone.now())
+            for score in (30, 10, 50, 20, 40)]
+
+    def export(self, export_format, **filter_by):
+        filter_by['format'] = export_format
+        url = '{0}?{1}'.format(
+            reverse('playerscore-export'),
+            urlencode(filter_by))
+        response = self.client.get(url)
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    @override_settings(GAMES_EXPORT_CHUNK_SIZE=2)
+    def test_export_player_scores_ndjson(self):
+        """
+        Ensure we can export every player score as NDJSON in chunks
+        """
+        # Two full chunks and the last partial one
+        with self.assertNumQueries(3):
+            response, content = self.export('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [row['score'] for row in rows],
+            [30, 10, 50, 20, 40])
+        self.assertEqual(rows[0]['pk'], self.player_scores[0].pk)
+        self.assertEqual(rows[0]['player'], 'Player')
+        self.assertEqual(rows[0]['game'], 'Game')
+        self.assertTrue(rows[0]['score_date'].endswith('Z'))
+
+    def test_export_filtered_player_scores_csv(self):
+        """
+        Ensure we can export the filtered player scores as CSV
+        """
+        response, content = self.export('csv', min_score=30, player_name='Player')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(rows[0], ['pk', 'score', 'score_date', 'player', 'game'])
+        self.assertEqual([row[1] for row in rows[1:]], ['30', '50', '40'])
+
+
+class QueryPlanTests(APITestCase):
+    def setUp(self):
+        benchmarks.seed_scores(3, 3, 20)
+
+    def test_filters_use_indexes(self):
+        """
+        Ensure every filter reads its table through an index and that
+        the requested ordering doesn't require sorting the rows
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest('The plans are checked with EXPLAIN QUERY PLAN')
+        for view_class, path, table in get_cases():
+            view = view_class.as_view()
+            plan = benchmarks.explain(get_main_query(
+                benchmarks.capture_view_queries(view, path), table))
+            self.assertTrue(
+                any(table in line and 'INDEX' in line for line in plan),
+                (path, plan))
+            if view_class is views.PlayerScoreList or 'ordering' in path:
+                self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, path)
+
+
+class CachedCountPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for number in range(7):
+            Player.objects.create(name='Player {0}'.format(number))
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_players(self, **params):
+        url = '{0}?{1}'.format(reverse('player-list'), urlencode(params))
+        response = self.client.get(url, format='json')
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_200_OK)
+        return response
+
+    def test_cached_count(self):
+        """
+        Ensure the count is cached until a player is created
+        """
+        with self.assertNumQueries(4):
+            response = self.get_players()
+        self.assertEqual(response.data['count'], 7)
+        # Versions, page and the page's scores, without the count
+        with self.assertNumQueries(3):
+            response = self.get_players()
+        self.assertEqual(response.data['count'], 7)
+        Player.objects.create(name='New Player')
+        response = self.get_players()
+        self.assertEqual(response.data['count'], 8)
+
+    def test_skip_count(self):
+        """
+        Ensure we can retrieve the pages without a count
+        """
+        response = self.get_players(count='false')
+        self.assertIsNone(response.data['count'])
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNotNone(response.data['next'])
+        response = self.get_players(count='false', offset=5)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
+    @override_settings(GAMES_COUNT_THRESHOLD=3)
+    def test_capped_count(self):
+        """
+        Ensure counting stops at the threshold, without sorting the rows
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_players(ordering='name')
+        self.assertEqual(response.data['count'], 3)
+        count_query = next(
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT COUNT(*)'))
+        self.assertNotIn('ORDER BY', count_query)
+        self.assertTrue(response.data['count_capped'])
+        self.assertIsNotNone(response.data['next'])
+
+
+class HyperlinkTemplateTests(GameFixtureTestCase):
+    def setUp(self):
+        super(HyperlinkTemplateTests, self).setUp()
+        for number in range(3):
+            game = self.create_game('Game {0}'.format(number))
+            player = Player.objects.create(name='Player {0}'.format(number))
+            PlayerScore.objects.create(
+                player=player,
+                game=game,
+                score=number,
+                score_date=timezone.now())
+        self.urls = [
+            reverse('user-list'),
+            reverse('gamecategory-list'),
+            reverse('game-list'),
+            reverse('player-list'),
+            reverse('playerscore-list'),
+            reverse('game-leaderboard', None, {game.pk}),
+            ]
+
+    def get_contents(self):
+        contents = []
+        for url in self.urls:
+            response = self.client.get(url, HTTP_HOST='api.example.org')
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_200_OK)
+            contents.append(response.content)
+        return contents
+
+    def test_templated_urls_match_reversed_urls(self):
+        """
+        Ensure the templated hyperlinks are identical to reversed ones
+        """
+        contents = self.get_contents()
+        with mock.patch.object(
+                HyperlinkTemplateMixin,
+                'get_url_template',
+                return_value=None):
+            self.assertEqual(contents, self.get_contents())
+
+    def test_reverse_once_per_view_name(self):
+        """
+        Ensure each view name is reversed once for all the rows
+        """
+        with mock.patch(
+                'rest_framework.relations.reverse',
+                wraps=relations.reverse) as reverse_mock:
+            self.client.get(reverse('player-list'), format='json')
+        self.assertEqual(
+            sorted(call[0][0] for call in reverse_mock.call_args_list),
+            ['game-detail', 'player-detail', 'playerscore-detail'])
+
+
+class CompiledSerializerTests(GameFixtureTestCase):
+    def setUp(self):
+        super(CompiledSerializerTests, self).setUp()
+        for number in range(3):
+            game = self.create_game(
+                'Game {0}'.format(number), played=number % 2 == 0)
+            player = Player.objects.create(
+                name='Player {0}'.format(number),
+                gender=Player.FEMALE if number % 2 else Player.MALE)
+            for score in range(number + 1):
+                PlayerScore.objects.create(
+                    player=player,
+                    game=game,
+                    score=score,
+                    score_date=timezone.now())
+        self.urls = [
+            reverse('game-list'),
+            reverse('game-detail', None, {game.pk}),
+            reverse('player-list'),
+            reverse('player-detail', None, {player.pk}),
+            reverse('playerscore-list'),
+            reverse('playerscore-detail', None, {player.scores.first().pk}),
+            ]
+
+    def get_contents(self):
+        contents = []
+        for url in self.urls:
+            response = self.client.get(url, format='json')
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_200_OK)
+            contents.append(response.content)
+        return contents
+
+    def test_compiled_representation_matches_regular(self):
+        """
+        Ensure the compiled serializers render the same bytes
+        """
+        contents = self.get_contents()
+        with self.settings(GAMES_COMPILED_SERIALIZERS=False):
+            self.assertEqual(contents, self.get_contents())
+
+
+class FastJSONTests(TestCase):
+    def get_data(self):
+        return OrderedDict([
+            ('url', Hyperlink('http://testserver/games/1/', 'Game')),
+            ('name', ugettext_lazy('Game')),
+            ('release_date', datetime(2016, 9, 1, 10, 0, 0, 123456, utc)),
+            ('date', date(2016, 9, 1)),
+            ('price', Decimal('1.50')),
+            ('scores', [1, 2.5, None, True]),
+            ('description', 'A\u2028B\u2029\u00e9'),
+            ])
+
+    def test_render_like_json_renderer(self):
+        """
+        Ensure the fast renderer renders like the JSONRenderer
+        """
+        data = self.get_data()
+        expected = JSONRenderer().render(data)
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        with mock.patch('games.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+        self.assertEqual(
+            FastJSONRenderer().render({1: 'A'}),
+            JSONRenderer().render({1: 'A'}))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'))
+
+    def test_parse_like_json_parser(self):
+        """
+        Ensure the fast parser parses like the JSONParser
+        """
+        content = JSONRenderer().render(self.get_data())
+        self.assertEqual(
+            FastJSONParser().parse(BytesIO(content)),
+            JSONParser().parse(BytesIO(content)))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"name": '))
+
+
+class LoadBenchmarkTests(TestCase):
+    def get_results(self, **values):
+        route = {
+            'path': '/games/',
+            'requests': 100,
+            'failures': 0,
+            'p50_ms': 10.0,
+            'p95_ms': 20.0,
+            'p99_ms': 30.0,
+            'requests_per_second': 100.0,
+            'queries_per_request': 2.0,
+            }
+        route.update(values)
+        return {'routes': {'game-list': route}}
+
+    def test_get_routes(self):
+        """
+        Ensure the load benchmark requests every route that answers GET
+        requests, with existing primary keys
+        """
+        benchmarks.seed_scores(3, 3, 20)
+        game = Game.objects.order_by('pk').first()
+        routes = dict(load.get_routes())
+        self.assertNotIn(views.PlayerScoreBulkCreate.name, routes)
+        self.assertEqual(len(routes), 16)
+        self.assertEqual(
+            routes[views.GameLeaderboard.name],
+            reverse(views.GameLeaderboard.name, kwargs={'pk': game.pk}))
+        for path in routes.values():
+            self.assertEqual(
+                self.client.get(path).status_code, status.HTTP_200_OK)
+
+    def test_percentile(self):
+        """
+        Ensure we compute nearest rank percentiles
+        """
+        values = list(range(100, 0, -1))
+        self.assertEqual(load.percentile(values, 0.50), 50)
+        self.assertEqual(load.percentile(values, 0.99), 99)
+        self.assertEqual(load.percentile([7], 0.95), 7)
+
+    def test_compare(self):
+        """
+        Ensure we report the regressions against a baseline only
+        beyond the tolerance
+        """
+        baseline = self.get_results()
+        self.assertEqual(load.compare(
+            self.get_results(p95_ms=24.0, requests_per_second=85.0),
+            baseline, 0.25), [])
+        regressions = load.compare(
+            self.get_results(
+                p95_ms=26.0,
+                requests_per_second=70.0,
+                queries_per_request=3.0,
+                failures=1),
+            baseline, 0.25)
+        self.assertEqual(len(regressions), 4)
+        self.assertTrue(all(
+            regression.startswith('game-list: ')
+            for regression in regressions))
+
+
+class ServerTimingTests(APITestCase):
+    def get_metrics(self, response):
+        return dict(
+            (metric.split(';')[0], metric)
+            for metric in response['Server-Timing'].split(', '))
+
+    def test_server_timing_header(self):
+        """
+        Ensure we add the queries and the time of each phase to responses
+        """
+        benchmarks.seed_scores(3, 3, 20)
+        url = reverse(views.PlayerScoreList.name)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metrics = self.get_metrics(response)
+        self.assertEqual(
+            sorted(metrics.keys()), ['db', 'render', 'total', 'view'])
+        self.assertIn(
+            'desc="{0} queries"'.format(len(context.captured_queries)),
+            metrics['db'])
+
+    @override_settings(
+        GAMES_SLOW_REQUEST_SAMPLE_RATE=1, GAMES_SLOW_REQUEST_THRESHOLD=0)
+    def test_log_sampled_slow_requests(self):
+        """
+        Ensure we log sampled requests slower than the threshold with
+        their SQL
+        """
+        url = reverse(views.GameCategoryList.name)
+        with self.assertLogs('games.middleware', 'WARNING') as logs:
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('GET {0}'.format(url), logs.output[0])
+        self.assertIn('games_gamecategory', logs.output[0])
+
+    @override_settings(
+        GAMES_SLOW_REQUEST_SAMPLE_RATE=1, GAMES_SLOW_REQUEST_THRESHOLD=0)
+    def test_streaming_responses_are_recorded(self):
+        """
+        Ensure we record and log the queries a streaming response runs
+        while its body is sent
+        """
+        benchmarks.seed_scores(3, 3, 20)
+        url = reverse(views.PlayerScoreExport.name)
+        with self.assertLogs('games.middleware', 'WARNING') as logs:
+            response = self.client.get(url, HTTP_ACCEPT='application/x-ndjson')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            timings = response.wsgi_request._request_timings
+            query_count = timings.query_count
+            self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 20)
+        self.assertNotIn('Server-Timing', response)
+        self.assertGreater(timings.query_count, query_count)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('games_playerscore', logs.output[0])
+
+    def test_no_sql_kept_without_sampling(self):
+        """
+        Ensure we don't log requests or keep their SQL when sampling is off
+        """
+        url = reverse(views.GameCategoryList.name)
+        with mock.patch('games.middleware.logger') as logger:
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.wsgi_request._request_timings.queries, [])
+        self.assertFalse(logger.warning.called)
+
+
+class SeedGamesTests(TestCase):
+    def seed(self, prefix):
+        call_command(
+            'seed_games',
+            users=2, categories=2, games=5, players=10, scores=300,
+            batch_size=100, prefix=prefix, stdout=StringIO())
+        return list(PlayerScore.objects.filter(
+            game__name__startswith=prefix).order_by('pk').values_list(
+                'player__name', 'game__name', 'score'))
+
+    def test_seed_games(self):
+        """
+        Ensure we generate the requested rows with their leaderboards
+        """
+        self.seed('First')
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(GameCategory.objects.count(), 2)
+        self.assertEqual(Game.objects.count(), 5)
+        self.assertEqual(Player.objects.count(), 10)
+        self.assertEqual(PlayerScore.objects.count(), 300)
+        self.assertEqual(LeaderboardEntry.objects.count(), 5 * 10)
+        # Scores are skewed towards the first games
+        game_scores = dict(Game.objects.annotate(
+            scores=Count('playerscore')).values_list('name', 'scores'))
+        self.assertGreater(game_scores['First game 0'], game_scores['First game 4'])
+
+    def test_seed_games_is_deterministic(self):
+        """
+        Ensure the same seed generates the same data
+        """
+        first = self.seed('First')
+        second = self.seed('Second')
+        self.assertEqual(
+            [(player[6:], game[6:], score) for player, game, score in first],
+            [(player[7:], game[7:], score) for player, game, score in second])
+
+    def test_seed_games_existing_prefix(self):
+        """
+        Ensure we don't generate rows with names that exist
+        """
+        self.seed('First')
+        with self.assertRaises(CommandError):
+            self.seed('First')
+
+
+class BoundedNestedCollectionTests(APITestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.game_category = GameCategory.objects.create(name='Category')
+        self.owners = []
+        for user_number in range(3):
+            owner = User.objects.create_user(
+                'owner{0}'.format(user_number),
+                'owner{0}@example.com'.format(user_number),
+                'password')
+            self.owners.append(owner)
+            for game_number in range(user_number * 6):
+                Game.objects.create(
+                    owner=owner,
+                    name='Game {0}-{1:02}'.format(user_number, game_number),
+                    game_category=self.game_category,
+                    release_date=now)
+
+    def get(self, url):
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    @override_settings(GAMES_NESTED_LIMIT=4)
+    def test_user_games_are_bounded(self):
+        """
+        Ensure we nest the first games of a user with their count and
+        a link to all of them
+        """
+        owner = self.owners[2]
+        games = self.get(reverse(views.UserDetail.name, None, {owner.pk}))['games']
+        self.assertEqual(games['count'], 12)
+        self.assertEqual(
+            [game['name'] for game in games['results']],
+            ['Game 2-00', 'Game 2-01', 'Game 2-02', 'Game 2-03'])
+        self.assertEqual(
+            games['url'],
+            'http://testserver{0}?owner={1}'.format(
+                reverse(views.GameList.name), owner.pk))
+        self.assertEqual(self.get(games['url'])['count'], 12)
+
+    @override_settings(GAMES_NESTED_LIMIT=4)
+    def test_game_category_games_are_bounded(self):
+        """
+        Ensure we nest the first game links of a game category
+        """
+        url = reverse(
+            views.GameCategoryDetail.name, None, {self.game_category.pk})
+        games = self.get(url)['games']
+        self.assertEqual(games['count'], 18)
+        self.assertEqual(len(games['results']), 4)
+        self.assertTrue(games['url'].endswith(
+            '?game_category={0}'.format(self.game_category.pk)))
+
+    def test_single_query_per_page(self):
+        """
+        Ensure the games of every user in a page are fetched with one query
+        """
+        with CaptureQueriesContext(connection) as context:
+            results = self.get(reverse(views.UserList.name))['results']
+        self.assertEqual(
+            [user['games']['count'] for user in results], [0, 6, 12])
+        games_queries = [
+            query for query in context.captured_queries
+            if 'games_game' in query['sql']]
+        self.assertEqual(len(games_queries), 1)
+
+    def test_without_window_functions(self):
+        """
+        Ensure databases without window functions fetch the same rows
+        """
+        relation = User._meta.get_field('games')
+        pks = [owner.pk for owner in self.owners]
+        expected = fetch_bounded_rows(relation, pks, 5)
+        with mock.patch(
+                'games.nested.supports_window_functions', return_value=False):
+            fallback = fetch_bounded_rows(relation, pks, 5)
+        self.assertEqual(expected[0], fallback[0])
+        self.assertEqual(
+            dict((pk, [game.pk for game in games])
+                 for pk, games in expected[1].items()),
+            dict((pk, [game.pk for game in games])
+                 for pk, games in fallback[1].items()))
+
+
+class GameBulkOperationTests(GameFixtureTestCase):
+    def setUp(self):
+        super(GameBulkOperationTests, self).setUp()
+        now = timezone.now()
+        self.other_game_category = GameCategory.objects.create(name='Other')
+        self.other_owner = User.objects.create_user(
+            'other', 'other@example.com', 'password')
+        player = Player.objects.create(name='Player')
+        for number in range(6):
+            game = self.create_game(
+                'Game {0}'.format(number),
+                owner=self.owner if number % 2 else self.other_owner,
+                game_category=(
+                    self.game_category if number < 4
+                    else self.other_game_category),
+                release_date=now)
+            PlayerScore.objects.create(
+                player=player, game=game, score=number, score_date=now)
+        self.client.force_authenticate(self.owner)
+
+    def get_url(self, **filters):
+        return '{0}?{1}'.format(reverse(views.GameList.name), urlencode(filters))
+
+    def assert_no_game_rows_retrieved(self, context):
+        for query in context.captured_queries:
+            if query['sql'].startswith('SELECT'):
+                self.assertNotIn('"games_game"', query['sql'])
+
+    def test_bulk_update_owned_games(self):
+        """
+        Ensure we update only the owned games that match the filters,
+        with a single statement
+        """
+        url = self.get_url(game_category=self.game_category.pk)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(url, {'played': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'updated': 2})
+        self.assert_no_game_rows_retrieved(context)
+        self.assertEqual(
+            sorted(Game.objects.filter(played=True).values_list(
+                'name', flat=True)),
+            ['Game 1', 'Game 3'])
+
+    def test_bulk_update_requires_played(self):
+        """
+        Ensure we don't update games without a valid played value
+        """
+        response = self.client.patch(self.get_url(), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete_owned_games(self):
+        """
+        Ensure we delete only the owned games that match the filters
+        with their scores and leaderboard entries
+        """
+        url = self.get_url(game_category=self.game_category.pk)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'deleted': 2})
+        self.assert_no_game_rows_retrieved(context)
+        self.assertEqual(
+            sorted(Game.objects.values_list('name', flat=True)),
+            ['Game 0', 'Game 2', 'Game 4', 'Game 5'])
+        self.assertEqual(PlayerScore.objects.count(), 4)
+        self.assertEqual(
+            LeaderboardEntry.objects.exclude(
+                game__in=Game.objects.all()).count(), 0)
+
+    def test_bulk_delete_invalidates_stats(self):
+        """
+        Ensure we expire the cached stats of the deleted games and of
+        the players with scores in them
+        """
+        cache.clear()
+        game = Game.objects.get(name='Game 1')
+        player = Player.objects.get()
+        for view_class, pk in (
+                (views.GameStats, game.pk), (views.PlayerStats, player.pk)):
+            self.client.get(reverse(view_class.name, kwargs={'pk': pk}))
+        self.client.delete(self.get_url(game_category=self.game_category.pk))
+        response = self.client.get(
+            reverse(views.GameStats.name, kwargs={'pk': game.pk}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(
+            reverse(views.PlayerStats.name, kwargs={'pk': player.pk}))
+        self.assertEqual(response.data['scores_count'], 4)
+        cache.clear()
+
+    def test_bulk_delete_requires_filters(self):
+        """
+        Ensure we don't delete all the owned games without filters
+        """
+        response = self.client.delete(self.get_url())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Game.objects.count(), 6)
+
+    def test_bulk_operations_reject_unknown_filters(self):
+        """
+        Ensure we don't change all the owned games when the parameters
+        aren't filters or the filters are invalid
+        """
+        for params in (
+                {'plyed': 'true'},
+                {'format': 'json'},
+                {'ordering': 'name'},
+                {'limit': 5},
+                {'game_category': 'category'}):
+            response = self.client.delete(self.get_url(**params))
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            response = self.client.patch(
+                self.get_url(**params), {'played': True}, format='json')
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST, params)
+        self.assertEqual(Game.objects.count(), 6)
+        self.assertEqual(Game.objects.filter(played=True).count(), 0)
+
+    def test_bulk_operations_require_authentication(self):
+        """
+        Ensure anonymous users can't update or delete games in bulk
+        """
+        self.client.force_authenticate(None)
+        url = self.get_url(game_category=self.game_category.pk)
+        response = self.client.patch(url, {'played': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(Game.objects.count(), 6)
+
+
+class ASGIHandlerTests(TestCase):
+    def call(self, application, scope, body_chunks):
+        messages = [
+            {'type': 'http.request', 'body': chunk, 'more_body': True}
+            for chunk in body_chunks[:-1]]
+        messages.append({'type': 'http.request', 'body': body_chunks[-1]})
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(application(scope, receive, send))
+        finally:
+            application.get_executor().shutdown(wait=True)
+            loop.close()
+        return sent
+
+    def get_scope(self, path, method='GET', headers=()):
+        return {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': b'format=json',
+            'headers': list(headers),
+            }
+
+    def test_environ(self):
+        """
+        Ensure we translate an ASGI scope into a WSGI environ
+        """
+        scope = self.get_scope('/games/', 'POST', [
+            (b'content-type', b'application/json'),
+            (b'x-forwarded-for', b'10.0.0.1'),
+            (b'x-forwarded-for', b'10.0.0.2'),
+            ])
+        environ = get_environ(scope, b'{}')
+        self.assertEqual(environ['REQUEST_METHOD'], 'POST')
+        self.assertEqual(environ['PATH_INFO'], '/games/')
+        self.assertEqual(environ['QUERY_STRING'], 'format=json')
+        self.assertEqual(environ['CONTENT_TYPE'], 'application/json')
+        self.assertEqual(environ['CONTENT_LENGTH'], '2')
+        self.assertEqual(environ['HTTP_X_FORWARDED_FOR'], '10.0.0.1,10.0.0.2')
+        self.assertEqual(environ['wsgi.input'].read(), b'{}')
+
+    def test_serve_wsgi_application(self):
+        """
+        Ensure we serve the API root through the ASGI handler
+        """
+        from gamesapi.asgi import application
+        handler = ASGIHandler(application.wsgi_application, threads=1)
+        sent = self.call(handler, self.get_scope('/'), [b''])
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], status.HTTP_200_OK)
+        self.assertIn(
+            (b'content-type', b'application/json'), sent[0]['headers'])
+        self.assertEqual(len(sent), 2)
+        self.assertIn(b'"games"', sent[1]['body'])
+
+    def test_stream_response_and_receive_body(self):
+        """
+        Ensure we receive the whole request body and send each chunk of
+        a streaming response
+        """
+        def wsgi_application(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            body = environ['wsgi.input'].read()
+            return (chunk for chunk in (body, b'', b'!'))
+
+        handler = ASGIHandler(wsgi_application, threads=1)
+        sent = self.call(
+            handler, self.get_scope('/', 'POST'), [b'Hello', b' world'])
+        self.assertEqual(
+            [(message.get('body'), message.get('more_body', False))
+             for message in sent[1:]],
+            [(b'Hello world', True), (b'!', True), (b'', False)])
+
+
+@override_settings(GAMES_READ_REPLICAS=['replica'])
+class ReadReplicaRouterTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(
+            'django.db.connections.databases',
+            {'replica': {'NAME': 'replica.sqlite3'}})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = ReadReplicaRouter()
+        self.factory = RequestFactory()
+
+    def get_read_databases(self, request, write=False):
+        databases = []
+
+        def get_response(request):
+            databases.append(self.router.db_for_read(Game))
+            if write:
+                self.router.db_for_write(Game)
+                databases.append(self.router.db_for_read(Game))
+            return HttpResponse()
+
+        response = ReadReplicaMiddleware(get_response)(request)
+        # Reads outside requests always go to the primary
+        self.assertEqual(self.router.db_for_read(Game), 'default')
+        return databases, response
+
+    def test_safe_requests_read_from_replicas(self):
+        """
+        Ensure we read from the replicas for safe requests only
+        """
+        databases, response = self.get_read_databases(
+            self.factory.get('/games/'))
+        self.assertEqual(databases, ['replica'])
+        self.assertNotIn(ReadReplicaMiddleware.cookie_name, response.cookies)
+        databases, response = self.get_read_databases(
+            self.factory.post('/games/'), write=True)
+        self.assertEqual(databases, ['default', 'default'])
+
+    def test_write_pins_to_primary(self):
+        """
+        Ensure we read from the primary after a write in the same request
+        and in the following requests from the client
+        """
+        databases, response = self.get_read_databases(
+            self.factory.get('/games/'), write=True)
+        self.assertEqual(databases, ['replica', 'default'])
+        databases, response = self.get_read_databases(
+            self.factory.patch('/games/'))
+        cookie = response.cookies[ReadReplicaMiddleware.cookie_name]
+        self.assertEqual(cookie['max-age'], 5)
+        request = self.factory.get('/games/')
+        request.COOKIES[ReadReplicaMiddleware.cookie_name] = cookie.value
+        databases, response = self.get_read_databases(request)
+        self.assertEqual(databases, ['default'])
+
+    def test_copy_wal_database(self):
+        """
+        Ensure the replica copy has the transactions committed to the WAL
+        and none of the previous copy
+        """
+        directory = tempfile.mkdtemp()
+        source = os.path.join(directory, 'primary.sqlite3')
+        target = os.path.join(directory, 'replica.sqlite3')
+        writer = sqlite3.connect(source, isolation_level=None)
+        try:
+            self.assertEqual(
+                writer.execute('PRAGMA journal_mode=WAL').fetchone()[0], 'wal')
+            writer.execute('CREATE TABLE scores (score INTEGER)')
+            writer.execute('INSERT INTO scores VALUES (10)')
+            self.assertTrue(os.path.getsize(source + '-wal'))
+            with open(target + '-wal', 'wb') as stale:
+                stale.write(b'stale')
+            copy_sqlite_database(source, target)
+            self.assertFalse(os.path.exists(target + '-wal'))
+            replica = sqlite3.connect(target)
+            try:
+                self.assertEqual(
+                    replica.execute('SELECT score FROM scores').fetchall(),
+                    [(10,)])
+            finally:
+                replica.close()
+        finally:
+            writer.close()
+            for file_name in os.listdir(directory):
+                os.remove(os.path.join(directory, file_name))
+            os.rmdir(directory)
+
+    @override_settings(GAMES_READ_REPLICAS=['replica'])
+    def test_export_reads_from_replicas(self):
+        """
+        Ensure the streamed player scores export reads from the replicas
+        """
+        benchmarks.seed_scores(3, 3, 20)
+        databases = []
+        db_for_read = ReadReplicaRouter.db_for_read
+
+        def record_db_for_read(router, model, **hints):
+            databases.append(db_for_read(router, model, **hints))
+            # The replica alias has no database behind it
+            return 'default'
+
+        with mock.patch.object(
+                ReadReplicaRouter, 'db_for_read', record_db_for_read):
+            response = self.client.get(
+                reverse(views.PlayerScoreExport.name),
+                HTTP_ACCEPT='application/x-ndjson')
+            del databases[:]
+            rows = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(rows), 20)
+        self.assertTrue(databases)
+        self.assertEqual(set(databases), {'replica'})
+        self.assertEqual(self.router.db_for_read(PlayerScore), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        """
+        Ensure we only migrate the primary
+        """
+        self.assertTrue(self.router.allow_migrate('default', 'games'))
+        self.assertFalse(self.router.allow_migrate('replica', 'games'))
+
+
+class SQLitePragmaTests(TestCase):
+    def get_file_connection(self, name):
+        settings_dict = dict(connection.settings_dict, NAME=name)
+        return DatabaseWrapper(settings_dict)
+
+    def get_pragma(self, database, name):
+        with database.cursor() as cursor:
+            cursor.execute('PRAGMA {0}'.format(name))
+            return cursor.fetchone()[0]
+
+    def test_new_connections_get_pragmas(self):
+        """
+        Ensure we apply GAMES_SQLITE_PRAGMAS to every new SQLite connection
+        """
+        directory = tempfile.mkdtemp()
+        name = os.path.join(directory, 'pragmas.sqlite3')
+        database = self.get_file_connection(name)
+        try:
+            # The journal mode is stored in the file, only the migration sets it
+            self.assertEqual(self.get_pragma(database, 'journal_mode'), 'delete')
+            # NORMAL
+            self.assertEqual(self.get_pragma(database, 'synchronous'), 1)
+            self.assertEqual(self.get_pragma(database, 'busy_timeout'), 5000)
+            self.assertEqual(self.get_pragma(database, 'cache_size'), -65536)
+        finally:
+            database.close()
+            for file_name in os.listdir(directory):
+                os.remove(os.path.join(directory, file_name))
+            os.rmdir(directory)
+
+    def test_invalid_pragma(self):
+        """
+        Ensure we refuse pragmas that would inject SQL
+        """
+        database = self.get_file_connection(':memory:')
+        pragmas = {'synchronous': 'OFF; DROP TABLE games_game'}
+        try:
+            with override_settings(GAMES_SQLITE_PRAGMAS=pragmas):
+                with self.assertRaises(ImproperlyConfigured):
+                    database.ensure_connection()
+        finally:
+            database.close()
+
+
+class NameSearchTests(GameFixtureTestCase):
+    def setUp(self):
+        super(NameSearchTests, self).setUp()
+        self.game = self.create_game('Super Mario Bros')
+        self.create_game('Marble Madness')
+        self.client.force_authenticate(self.owner)
+
+    def search_games(self, term):
+        url = '{0}?{1}'.format(
+            reverse(views.GameList.name), urlencode({'search': term}))
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [game['name'] for game in response.data['results']]
+
+    def test_search_word_prefixes(self):
+        """
+        Ensure we find the names with words that start with every term
+        """
+        self.assertEqual(self.search_games('mario'), ['Super Mario Bros'])
+        self.assertEqual(
+            sorted(self.search_games('mar')),
+            ['Marble Madness', 'Super Mario Bros'])
+        self.assertEqual(self.search_games('bro sup'), ['Super Mario Bros'])
+        self.assertEqual(self.search_games('ario'), [])
+
+    def test_index_follows_changes(self):
+        """
+        Ensure we index the names that are saved and forget the deleted ones
+        """
+        self.game.name = 'Super Luigi Bros'
+        self.game.save()
+        self.assertEqual(self.search_games('mario'), [])
+        self.assertEqual(self.search_games('luigi'), ['Super Luigi Bros'])
+        self.game.delete()
+        self.assertEqual(self.search_games('luigi'), [])
+        response = self.client.delete(
+            '{0}?{1}'.format(
+                reverse(views.GameList.name), urlencode({'name': 'Marble Madness'})),
+            format='json')
+        self.assertEqual(response.data, {'deleted': 1})
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM games_game_search')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_detail_views_ignore_search(self):
+        """
+        Ensure we don't search the views without search fields
+        """
+        url = '{0}?{1}'.format(
+            reverse(views.GameDetail.name, kwargs={'pk': self.game.pk}),
+            urlencode({'search': 'zelda'}))
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Super Mario Bros')
+
+    def test_search_query_syntax_is_ignored(self):
+        """
+        Ensure we only search the words of the terms
+        """
+        self.assertEqual(
+            get_match_query(['"mario"', 'OR*', 'NEAR(bros)']),
+            '"mario"* "OR"* "NEAR"* "bros"*')
+        self.assertEqual(self.search_games('"mario" OR'), [])
+        self.assertEqual(self.search_games('"'), [])
+
+
+class AutocompleteTests(GameFixtureTestCase):
+    def setUp(self):
+        for index in NAME_INDEXES.values():
+            index.clear()
+        super(AutocompleteTests, self).setUp()
+        for name in ('Super Mario Bros', 'mario Kart', 'Metroid', 'Zelda'):
+            self.create_game(name)
+        for name in ('Mario', 'Brandon', 'Kevin'):
+            Player.objects.create(name=name)
+
+    def tearDown(self):
+        for index in NAME_INDEXES.values():
+            index.clear()
+
+    def get_suggestions(self, **params):
+        url = '{0}?{1}'.format(reverse(views.Autocomplete.name), urlencode(params))
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_suggest_names(self):
+        """
+        Ensure we suggest the names that start with the prefix without
+        reading the database after the names were loaded
+        """
+        self.assertEqual(
+            self.get_suggestions(q='MA'),
+            {'games': ['mario Kart'], 'players': ['Mario']})
+        with CaptureQueriesContext(connection) as context:
+            data = self.get_suggestions(q='m', limit=2)
+        self.assertEqual(data['games'], ['mario Kart', 'Metroid'])
+        self.assertEqual(data['players'], ['Mario'])
+        for query in context.captured_queries:
+            self.assertNotIn('"games_game"', query['sql'])
+            self.assertNotIn('"games_player"', query['sql'])
+        self.assertEqual(
+            self.get_suggestions(q=''), {'games': [], 'players': []})
+
+    def test_index_follows_changes(self):
+        """
+        Ensure we suggest the names that were saved and not the deleted ones
+        """
+        self.assertEqual(self.get_suggestions(q='super')['games'], ['Super Mario Bros'])
+        game = Game.objects.get(name='Super Mario Bros')
+        game.name = 'Super Metroid'
+        game.save()
+        Player.objects.get(name='Kevin').delete()
+        self.assertEqual(self.get_suggestions(q='super')['games'], ['Super Metroid'])
+        self.assertEqual(self.get_suggestions(q='kev')['players'], [])
+
+    @override_settings(GAMES_AUTOCOMPLETE_MAX_NAMES=2)
+    def test_capped_index(self):
+        """
+        Ensure we suggest the names past the capped index from the database
+        """
+        self.assertEqual(self.get_suggestions(q='mario')['games'], ['mario Kart'])
+        self.assertEqual(len(NAME_INDEXES[Game].entries), 2)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.get_suggestions(q='mario')['games'], ['mario Kart'])
+        for query in context.captured_queries:
+            self.assertNotIn('"games_game"', query['sql'])
+        self.assertEqual(
+            self.get_suggestions(q='m')['games'], ['mario Kart', 'Metroid'])
+        self.assertEqual(self.get_suggestions(q='s')['games'], ['Super Mario Bros'])
+
+
+class ScoreStatsTests(GameFixtureTestCase):
+    def setUp(self):
+        cache.clear()
+        super(ScoreStatsTests, self).setUp()
+        self.game = self.create_game('Game')
+        self.player = Player.objects.create(name='Player')
+        self.other_player = Player.objects.create(name='Other')
+        self.score_date = timezone.make_aware(
+            datetime(2016, 10, 1, 12, 0), timezone=utc)
+        for player, score in (
+                (self.player, 5), (self.player, 15),
+                (self.player, 95), (self.other_player, 35)):
+            PlayerScore.objects.create(
+                player=player,
+                game=self.game,
+                score=score,
+                score_date=self.score_date)
+
+    def tearDown(self):
+        cache.clear()
+
+    def get_stats(self, view_class, pk):
+        url = reverse(view_class.name, kwargs={'pk': pk})
+        return self.client.get(url, format='json')
+
+    def test_player_stats(self):
+        """
+        Ensure we aggregate the scores of a player
+        """
+        response = self.get_stats(views.PlayerStats, self.player.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['scores_count'], 3)
+        self.assertEqual(response.data['games_count'], 1)
+        self.assertEqual(response.data['best_score'], 95)
+        self.assertAlmostEqual(response.data['average_score'], 115 / 3)
+        response = self.get_stats(views.PlayerStats, self.player.pk + 100)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(GAMES_STATS_HISTOGRAM_BUCKETS=4)
+    def test_game_histogram(self):
+        """
+        Ensure we count the scores of a game in equal width buckets
+        """
+        response = self.get_stats(views.GameStats, self.game.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['players_count'], 2)
+        self.assertEqual(response.data['worst_score'], 5)
+        self.assertEqual(
+            [(bucket['from'], bucket['to'], bucket['count'])
+             for bucket in response.data['histogram']],
+            [(5, 27, 2), (28, 50, 1), (51, 73, 0), (74, 96, 1)])
+
+    def test_new_scores_invalidate_stats(self):
+        """
+        Ensure we answer from the cache until the scores change
+        """
+        self.get_stats(views.GameStats, self.game.pk)
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_stats(views.GameStats, self.game.pk)
+        for query in context.captured_queries:
+            self.assertNotIn('"games_playerscore"', query['sql'])
+        PlayerScore.objects.create(
+            player=self.other_player,
+            game=self.game,
+            score=100,
+            score_date=self.score_date)
+        response = self.get_stats(views.GameStats, self.game.pk)
+        self.assertEqual(response.data['scores_count'], 5)
+        self.assertEqual(response.data['best_score'], 100)
+        score = PlayerScore.objects.get(score=35)
+        score.player = self.player
+        score.save()
+        response = self.get_stats(views.PlayerStats, self.player.pk)
+        self.assertEqual(response.data['scores_count'], 4)
+
+    def test_moved_scores_invalidate_stats(self):
+        """
+        Ensure we invalidate the stats of the player a score moves from
+        """
+        self.get_stats(views.PlayerStats, self.other_player.pk)
+        score = PlayerScore.objects.get(score=35)
+        score.player = self.player
+        score.save()
+        response = self.get_stats(views.PlayerStats, self.other_player.pk)
+        self.assertEqual(response.data['scores_count'], 0)
+
+    def test_new_scores_keep_other_stats(self):
+        """
+        Ensure a new score of a player keeps the cached stats of the
+        other players
+        """
+        self.get_stats(views.PlayerStats, self.other_player.pk)
+        PlayerScore.objects.create(
+            player=self.player,
+            game=self.game,
+            score=100,
+            score_date=self.score_date)
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_stats(views.PlayerStats, self.other_player.pk)
+        for query in context.captured_queries:
+            self.assertNotIn('"games_playerscore"', query['sql'])
+        self.assertEqual(response.data['scores_count'], 1)
+        response = self.get_stats(views.PlayerStats, self.player.pk)
+        self.assertEqual(response.data['scores_count'], 4)
+
+    def test_other_processes_invalidate_stats(self):
+        """
+        Ensure writes that only bumped the stats versions, like those of
+        another process, invalidate the cached stats
+        """
+        self.get_stats(views.PlayerStats, self.player.pk)
+        PlayerScore.objects.filter(player=self.player).update(score=200)
+        invalidate_stats('player', [self.player.pk])
+        response = self.get_stats(views.PlayerStats, self.player.pk)
+        self.assertEqual(response.data['best_score'], 200)
+
+    def test_deleted_rows_invalidate_stats(self):
+        """
+        Ensure we don't answer the cached stats of a deleted player
+        """
+        pk = self.other_player.pk
+        self.get_stats(views.PlayerStats, pk)
+        self.other_player.delete()
+        response = self.get_stats(views.PlayerStats, pk)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
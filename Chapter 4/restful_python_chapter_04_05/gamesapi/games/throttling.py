@@ -0,0 +1,156 @@
+"""
+Book: Building RESTful Python Web Services
+Chapter 4: Throttling, Filtering, Testing and Deploying an API with Django
+Author: Gaston C. Hillar - Twitter.com/gastonhillar
+Publisher: Packt Publishing Ltd. - http://www.packtpub.com
+"""
+import random
+import sqlite3
+import threading
+import time
+from django.conf import settings
+from rest_framework import throttling
+
+
+class TokenBucketStore(object):
+    """
+    Token buckets kept in a SQLite file, so every worker process on the
+    host shares them. Each key is a single row with the remaining tokens
+    and the time they were counted. A missing row is a full bucket.
+    """
+    # Probability of deleting the buckets that refilled in a transaction
+    prune_probability = 0.01
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def get_connection(self):
+        path = getattr(settings, 'GAMES_THROTTLE_DATABASE', ':memory:')
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.path != path:
+            # We manage the transactions ourselves
+            connection = sqlite3.connect(
+                path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_bucket ('
+                'key TEXT PRIMARY KEY, '
+                'tokens REAL NOT NULL, '
+                'updated REAL NOT NULL, '
+                'full_at REAL NOT NULL)')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS throttle_bucket_full_at '
+                'ON throttle_bucket (full_at)')
+            self.local.connection = connection
+            self.local.path = path
+        return connection
+
+    def consume(self, buckets, now=None):
+        """
+        Take a token from every (key, capacity, refill rate per second)
+        bucket in a single transaction, or from none of them if any is
+        empty. Return the seconds to wait for each bucket, None when it
+        had a token.
+        """
+        if not buckets:
+            return []
+        if now is None:
+            now = time.time()
+        connection = self.get_connection()
+        keys = [key for key, capacity, rate in buckets]
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = connection.execute(
+                'SELECT key, tokens, updated FROM throttle_bucket '
+                'WHERE key IN ({0})'.format(', '.join('?' * len(keys))),
+                keys)
+            counted = {key: (tokens, updated) for key, tokens, updated in rows}
+            levels = []
+            waits = []
+            for key, capacity, rate in buckets:
+                tokens, updated = counted.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                levels.append(tokens)
+                waits.append(None if tokens >= 1 else (1 - tokens) / rate)
+            if all(wait is None for wait in waits):
+                connection.executemany(
+                    'INSERT OR REPLACE INTO throttle_bucket '
+                    'VALUES (?, ?, ?, ?)',
+                    [(key, tokens - 1, now, now + (capacity - tokens + 1) / rate)
+                     for (key, capacity, rate), tokens in zip(buckets, levels)])
+            if random.random() < self.prune_probability:
+                connection.execute(
+                    'DELETE FROM throttle_bucket WHERE full_at < ?', (now,))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return waits
+
+    def clear(self):
+        self.get_connection().execute('DELETE FROM throttle_bucket')
+
+
+token_buckets = TokenBucketStore()
+
+
+class SharedRateThrottleMixin(object):
+    """
+    Replaces the request history of a SimpleRateThrottle with a token
+    bucket in the shared store, which refills num_requests tokens over
+    the duration. The first throttle checked for a request takes the
+    tokens for all the shared throttles of the view in one transaction.
+    """
+    def get_bucket(self, request, view):
+        if self.rate is None:
+            return None
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return None
+        return (key, self.num_requests, self.num_requests / self.duration)
+
+    def allow_request(self, request, view):
+        waits = getattr(request, '_shared_throttle_waits', None)
+        if waits is None or type(self) not in waits:
+            throttles = [
+                throttle for throttle in view.get_throttles()
+                if isinstance(throttle, SharedRateThrottleMixin)]
+            if type(self) not in [type(throttle) for throttle in throttles]:
+                throttles = [self]
+            buckets = [
+                (type(throttle), throttle.get_bucket(request, view))
+                for throttle in throttles]
+            consumed = iter(token_buckets.consume(
+                [bucket for throttle_class, bucket in buckets if bucket]))
+            waits = {
+                throttle_class: next(consumed) if bucket else None
+                for throttle_class, bucket in buckets}
+            request._shared_throttle_waits = waits
+        self.remaining_wait = waits[type(self)]
+        return self.remaining_wait is None
+
+    def wait(self):
+        return self.remaining_wait
+
+
+class SharedAnonRateThrottle(SharedRateThrottleMixin,
+                             throttling.AnonRateThrottle):
+    pass
+
+
+class SharedUserRateThrottle(SharedRateThrottleMixin,
+                             throttling.UserRateThrottle):
+    pass
+
+
+class SharedScopedRateThrottle(SharedRateThrottleMixin,
+                               throttling.ScopedRateThrottle):
+    def get_bucket(self, request, view):
+        # The rate depends on the scope of the view
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return None
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super(SharedScopedRateThrottle, self).get_bucket(request, view)
@@ -21,15 +21,30 @@ urlpatterns = [
     url(r'^games/(?P<pk>[0-9]+)/$', 
         views.GameDetail.as_view(),
         name=views.GameDetail.name),
+    url(r'^games/(?P<pk>[0-9]+)/leaderboard/$', 
+        views.GameLeaderboard.as_view(),
+        name=views.GameLeaderboard.name),
+    url(r'^games/(?P<pk>[0-9]+)/stats/$',
+        views.GameStats.as_view(),
+        name=views.GameStats.name),
     url(r'^players/$', 
         views.PlayerList.as_view(),
         name=views.PlayerList.name),
     url(r'^players/(?P<pk>[0-9]+)/$', 
         views.PlayerDetail.as_view(),
         name=views.PlayerDetail.name),
+    url(r'^players/(?P<pk>[0-9]+)/stats/$',
+        views.PlayerStats.as_view(),
+        name=views.PlayerStats.name),
     url(r'^player-scores/$', 
         views.PlayerScoreList.as_view(),
         name=views.PlayerScoreList.name),
+    url(r'^player-scores/bulk/$', 
+        views.PlayerScoreBulkCreate.as_view(),
+        name=views.PlayerScoreBulkCreate.name),
+    url(r'^player-scores/export/$', 
+        views.PlayerScoreExport.as_view(),
+        name=views.PlayerScoreExport.name),
     url(r'^player-scores/(?P<pk>[0-9]+)/$', 
         views.PlayerScoreDetail.as_view(),
         name=views.PlayerScoreDetail.name),
@@ -39,6 +54,9 @@ urlpatterns = [
     url(r'^users/(?P<pk>[0-9]+)/$',
         views.UserDetail.as_view(),
         name=views.UserDetail.name),
+    url(r'^autocomplete/$',
+        views.Autocomplete.as_view(),
+        name=views.Autocomplete.name),
     url(r'^$',
         views.ApiRoot.as_view(),
         name=views.ApiRoot.name),
@@ -8,54 +8,79 @@ from games.models import GameCategory
 from games.models import Game
 from games.models import Player
 from games.models import PlayerScore
+from games.models import LeaderboardEntry
 from games.serializers import GameCategorySerializer
 from games.serializers import GameSerializer
 from games.serializers import PlayerSerializer
 from games.serializers import PlayerScoreSerializer
+from games.serializers import LeaderboardEntrySerializer
+from games.serializers import PlayerScoreBulkSerializer
+from games.serializers import GameBulkUpdateSerializer
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from rest_framework import generics
+from rest_framework import serializers
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.reverse import reverse
 from django.contrib.auth.models import User
 from games.serializers import UserSerializer
 from rest_framework import permissions
 from games.permissions import IsOwnerOrReadOnly
-from rest_framework.throttling import ScopedRateThrottle
+from games.queryplanner import QueryPlannerMixin
+from games.conditional import ConditionalGetMixin
+from games.pagination import KeysetPagination
+from games.throttling import SharedScopedRateThrottle
 from rest_framework import filters
-from django_filters import NumberFilter, DateTimeFilter, AllValuesFilter
+from django_filters import NumberFilter, DateTimeFilter
+from games.filters import RelatedNameFilter
+from games.export import iterate_rows
+from games.renderers import NDJSONRenderer
+from games.renderers import CSVRenderer
+from games.conditional import bump_model_version
+from games.autocomplete import NAME_INDEXES
+from games.search import unindex_queryset
+from games.stats import get_game_stats
+from games.stats import get_player_stats
+from games.stats import invalidate_queryset_stats
 
 
-class UserList(generics.ListAPIView):
+class UserList(ConditionalGetMixin, QueryPlannerMixin, generics.ListAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     name = 'user-list'
 
 
-class UserDetail(generics.RetrieveAPIView):
+class UserDetail(ConditionalGetMixin, QueryPlannerMixin, generics.RetrieveAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     name = 'user-detail'
 
 
-class GameCategoryList(generics.ListCreateAPIView):
+class GameCategoryList(ConditionalGetMixin, QueryPlannerMixin, generics.ListCreateAPIView):
     queryset = GameCategory.objects.all()
     serializer_class = GameCategorySerializer
     name = 'gamecategory-list'
     throttle_scope = 'game-categories'
-    throttle_classes = (ScopedRateThrottle,)
+    throttle_classes = (SharedScopedRateThrottle,)
     filter_fields = ('name',)
     search_fields = ('^name',)
     ordering_fields = ('name',)
 
 
-class GameCategoryDetail(generics.RetrieveUpdateDestroyAPIView):
+class GameCategoryDetail(ConditionalGetMixin, QueryPlannerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = GameCategory.objects.all()
     serializer_class = GameCategorySerializer
     name = 'gamecategory-detail'
     throttle_scope = 'game-categories'
-    throttle_classes = (ScopedRateThrottle,)
+    throttle_classes = (SharedScopedRateThrottle,)
 
 
-class GameList(generics.ListCreateAPIView):
+class GameList(ConditionalGetMixin, QueryPlannerMixin, generics.ListCreateAPIView):
     queryset = Game.objects.all()
     serializer_class = GameSerializer
     name = 'game-list'
@@ -81,8 +106,88 @@ class GameList(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    def get_owned_queryset(self):
+        """
+        Return the filtered games that the permissions allow the request
+        to change, without retrieving them.
+        """
+        queryset = self.filter_queryset(self.queryset.all()).order_by()
+        for permission in self.get_permissions():
+            if hasattr(permission, 'filter_queryset'):
+                queryset = permission.filter_queryset(self.request, queryset)
+        return queryset
 
-class GameDetail(generics.RetrieveUpdateDestroyAPIView):
+    def get_bulk_filter_errors(self, required):
+        """
+        Return the errors of the query parameters of a bulk operation.
+        Only the filter fields and the search parameter are accepted, so
+        a mistyped filter doesn't change every owned game.
+        """
+        filter_class = filters.DjangoFilterBackend().get_filter_class(
+            self, self.queryset)
+        filterset = filter_class(
+            self.request.query_params, queryset=self.queryset.all())
+        accepted = set(filterset.filters) | {api_settings.SEARCH_PARAM}
+        names = set(self.request.query_params)
+        unknown = sorted(names - accepted)
+        if unknown:
+            return {'detail': 'Unknown filters: {0}.'.format(', '.join(unknown))}
+        if required and not names:
+            return {'detail': 'Filter the games to change.'}
+        if not filterset.form.is_valid():
+            return filterset.form.errors
+        return None
+
+    def patch(self, request, *args, **kwargs):
+        # Updates every owned game that matches the filters
+        errors = self.get_bulk_filter_errors(required=False)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer = GameBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = self.perform_bulk_update(
+            self.get_owned_queryset(), serializer.validated_data)
+        return Response({'updated': updated})
+
+    def delete(self, request, *args, **kwargs):
+        # Deletes every owned game that matches the filters
+        errors = self.get_bulk_filter_errors(required=True)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        deleted = self.perform_bulk_destroy(self.get_owned_queryset())
+        return Response({'deleted': deleted})
+
+    def perform_bulk_update(self, queryset, validated_data):
+        with transaction.atomic():
+            updated = queryset.update(**validated_data)
+            # update doesn't send the post_save signal
+            bump_model_version(Game)
+        return updated
+
+    def perform_bulk_destroy(self, queryset):
+        games = queryset.values('pk')
+        player_scores = PlayerScore.objects.filter(game__in=games)
+        with transaction.atomic():
+            # The stats of the players with scores in the games change
+            invalidate_queryset_stats('player', player_scores, 'player_id')
+            invalidate_queryset_stats('game', queryset, 'pk')
+            # We delete the rows that cascade first, with one statement
+            # for each table. QuerySet.delete would retrieve every row to
+            # send the post_delete signal, and its receivers would run
+            # their own queries for each row.
+            LeaderboardEntry.objects.filter(game__in=games)._raw_delete(
+                queryset.db)
+            unindex_queryset(queryset)
+            player_scores._raw_delete(queryset.db)
+            deleted = queryset._raw_delete(queryset.db)
+            for model in (LeaderboardEntry, PlayerScore, Game):
+                bump_model_version(model)
+        # The names are loaded again on the next suggestion
+        NAME_INDEXES[Game].clear()
+        return deleted
+
+
+class GameDetail(ConditionalGetMixin, QueryPlannerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Game.objects.all()
     serializer_class = GameSerializer
     name = 'game-detail'
@@ -91,7 +196,23 @@ class GameDetail(generics.RetrieveUpdateDestroyAPIView):
         IsOwnerOrReadOnly)
 
 
-class PlayerList(generics.ListCreateAPIView):
+class GameStats(generics.GenericAPIView):
+    """
+    The number of scores and players of a game, its best, worst and
+    average score and a histogram of the scores, cached until the scores
+    change.
+    """
+    queryset = Game.objects.all()
+    name = 'game-stats'
+
+    def get(self, request, *args, **kwargs):
+        stats = get_game_stats(self.kwargs['pk'])
+        if stats is None:
+            raise NotFound()
+        return Response(stats)
+
+
+class PlayerList(ConditionalGetMixin, QueryPlannerMixin, generics.ListCreateAPIView):
     queryset = Player.objects.all()
     serializer_class = PlayerSerializer
     name = 'player-list'
@@ -107,7 +228,23 @@ class PlayerList(generics.ListCreateAPIView):
         )
 
 
-class PlayerDetail(generics.RetrieveUpdateDestroyAPIView):
+class PlayerStats(generics.GenericAPIView):
+    """
+    The number of scores of a player, the games played, the best and
+    average score and the date of the last one, cached until the scores
+    change.
+    """
+    queryset = Player.objects.all()
+    name = 'player-stats'
+
+    def get(self, request, *args, **kwargs):
+        stats = get_player_stats(self.kwargs['pk'])
+        if stats is None:
+            raise NotFound()
+        return Response(stats)
+
+
+class PlayerDetail(ConditionalGetMixin, QueryPlannerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Player.objects.all()
     serializer_class = PlayerSerializer
     name = 'player-detail'
@@ -122,9 +259,9 @@ class PlayerScoreFilter(filters.FilterSet):
         name='score_date', lookup_expr='gte')
     to_score_date = DateTimeFilter(
         name='score_date', lookup_expr='lte')
-    player_name = AllValuesFilter(
+    player_name = RelatedNameFilter(
         name='player__name')
-    game_name = AllValuesFilter(
+    game_name = RelatedNameFilter(
         name='game__name')
 
     class Meta:
@@ -142,10 +279,11 @@ class PlayerScoreFilter(filters.FilterSet):
             )
 
 
-class PlayerScoreList(generics.ListCreateAPIView):
+class PlayerScoreList(ConditionalGetMixin, QueryPlannerMixin, generics.ListCreateAPIView):
     queryset = PlayerScore.objects.all()
     serializer_class = PlayerScoreSerializer
     name = 'playerscore-list'
+    pagination_class = KeysetPagination
     filter_class = PlayerScoreFilter
     ordering_fields = (
         'score',
@@ -153,12 +291,107 @@ class PlayerScoreList(generics.ListCreateAPIView):
         )
 
 
-class PlayerScoreDetail(generics.RetrieveUpdateDestroyAPIView):
+class PlayerScoreBulkCreate(generics.CreateAPIView):
+    serializer_class = PlayerScoreBulkSerializer
+    name = 'playerscore-bulk'
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['many'] = True
+        return super(PlayerScoreBulkCreate, self).get_serializer(*args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        player_scores = serializer.save()
+        return Response(
+            {'created': len(player_scores)},
+            status=status.HTTP_201_CREATED)
+
+
+class PlayerScoreExport(generics.GenericAPIView):
+    queryset = PlayerScore.objects.all()
+    name = 'playerscore-export'
+    renderer_classes = (NDJSONRenderer, CSVRenderer)
+    # We accept the PlayerScoreFilter parameters, the rows are in pk order
+    filter_backends = (filters.DjangoFilterBackend,)
+    filter_class = PlayerScoreFilter
+    # Export field names and the values retrieved for them
+    export_fields = (
+        ('pk', 'pk'),
+        ('score', 'score'),
+        ('score_date', 'score_date'),
+        ('player', 'player__name'),
+        ('game', 'game__name'),
+        )
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        names = [name for name, lookup in self.export_fields]
+        lookups = [lookup for name, lookup in self.export_fields]
+        rows = iterate_rows(
+            queryset,
+            lookups,
+            {'score_date': serializers.DateTimeField().to_representation})
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.render_rows(names, rows),
+            content_type='{0}; charset={1}'.format(
+                renderer.media_type, renderer.charset))
+        response['Content-Disposition'] = (
+            'attachment; filename="player-scores.{0}"'.format(renderer.format))
+        return response
+
+
+class PlayerScoreDetail(ConditionalGetMixin, QueryPlannerMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = PlayerScore.objects.all()
     serializer_class = PlayerScoreSerializer
     name = 'playerscore-detail'
 
 
+class GameLeaderboard(ConditionalGetMixin, QueryPlannerMixin, generics.ListAPIView):
+    queryset = LeaderboardEntry.objects.all()
+    serializer_class = LeaderboardEntrySerializer
+    name = 'game-leaderboard'
+    # The leaderboard is bounded, so we don't paginate or filter it
+    pagination_class = None
+    filter_backends = ()
+
+    def get_queryset(self):
+        game = generics.get_object_or_404(Game, pk=self.kwargs['pk'])
+        return super(GameLeaderboard, self).get_queryset().filter(game=game)
+
+    def list(self, request, *args, **kwargs):
+        entries = list(self.get_queryset())
+        for rank, entry in enumerate(entries, start=1):
+            entry.rank = rank
+        serializer = self.get_serializer(entries, many=True)
+        return Response(serializer.data)
+
+
+class Autocomplete(generics.GenericAPIView):
+    """
+    Suggests the game and player names that start with the q parameter,
+    from the in-memory name indexes.
+    """
+    name = 'autocomplete'
+
+    def get(self, request, *args, **kwargs):
+        prefix = request.query_params.get('q', '').strip()
+        max_limit = getattr(settings, 'GAMES_AUTOCOMPLETE_MAX_LIMIT', 50)
+        try:
+            limit = int(request.query_params.get(
+                'limit', getattr(settings, 'GAMES_AUTOCOMPLETE_LIMIT', 10)))
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+        limit = max(1, min(limit, max_limit))
+        if not prefix:
+            return Response({'games': [], 'players': []})
+        return Response({
+            'games': NAME_INDEXES[Game].suggest(prefix, limit),
+            'players': NAME_INDEXES[Player].suggest(prefix, limit),
+            })
+
+
 class ApiRoot(generics.GenericAPIView):
     name = 'api-root'
     def get(self, request, *args, **kwargs):
@@ -168,4 +401,5 @@ class ApiRoot(generics.GenericAPIView):
             'games': reverse(GameList.name, request=request),
             'scores': reverse(PlayerScoreList.name, request=request),
             'users': reverse(UserList.name, request=request),
+            'autocomplete': reverse(Autocomplete.name, request=request),
             })
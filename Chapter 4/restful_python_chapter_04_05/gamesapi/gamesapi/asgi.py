@@ -0,0 +1,18 @@
+"""
+ASGI config for gamesapi project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 1.10 has no ASGI support, so the application serves the WSGI handler
+from a pool of threads, see games.asgi.ASGIHandler. Run it with any ASGI
+server, for example ``uvicorn gamesapi.asgi:application``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "gamesapi.settings")
+
+from games.asgi import ASGIHandler  # noqa: E402 settings must be configured
+
+application = ASGIHandler(get_wsgi_application())
@@ -54,6 +54,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the total time covers the other middleware
+    'games.middleware.ServerTimingMiddleware',
+    # Before any middleware that reads from the database
+    'games.middleware.ReadReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -91,9 +95,49 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Each worker thread keeps its connection open between requests
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Pragmas run on every new SQLite connection. NORMAL only syncs at
+# the checkpoints of the WAL journal, which the 0010_sqlite_wal_journal
+# migration enables once, since the journal mode is stored in the file.
+GAMES_SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative sizes are in KiB
+    'cache_size': -64 * 1024,
+}
+
+# Aliases of the read replicas in DATABASES, which serve the reads of
+# the safe requests
+GAMES_READ_REPLICAS = []
+
+# Set GAMES_SQLITE_REPLICA to a file that the sync_sqlite_replica command
+# keeps as a copy of db.sqlite3 to try the read replicas locally
+if os.environ.get('GAMES_SQLITE_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['GAMES_SQLITE_REPLICA'],
+        # The sync replaces the file, and an open connection would keep
+        # reading the previous copy, so every request opens a new one
+        'CONN_MAX_AGE': 0,
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+    GAMES_READ_REPLICAS = ['replica']
+
+DATABASE_ROUTERS = ['games.routers.ReadReplicaRouter']
+
+# Seconds a client reads from the primary database after a write. The
+# client is pinned with a cookie, so clients that don't send cookies back,
+# like most API clients, may not see their own writes in the next reads
+# until the replicas are synced.
+GAMES_REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.10/ref/settings/#auth-password-validators
@@ -135,20 +179,31 @@ STATIC_URL = '/static/'
 
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS':
-    'games.pagination.LimitOffsetPaginationWithMaxLimit',
+    'games.pagination.CachedCountPagination',
     'PAGE_SIZE': 5,
+    # The fast JSON renderer and parser use orjson when it is installed
+    'DEFAULT_RENDERER_CLASSES': (
+        'games.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        ),
+    'DEFAULT_PARSER_CLASSES': (
+        'games.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        ),
     'DEFAULT_FILTER_BACKENDS': (
         'rest_framework.filters.DjangoFilterBackend',
-        'rest_framework.filters.SearchFilter',
+        # Searches the names with their SQLite FTS5 index
+        'games.search.NameSearchFilter',
         'rest_framework.filters.OrderingFilter',
         ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.BasicAuthentication',
+        'games.authentication.CachedBasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         ),
     'DEFAULT_THROTTLE_CLASSES': (
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'games.throttling.SharedAnonRateThrottle',
+        'games.throttling.SharedUserRateThrottle',
     ),
     'DEFAULT_THROTTLE_RATES': {
         'anon': '5/hour',
@@ -157,6 +212,64 @@ REST_FRAMEWORK = {
     }
 }
 
+# Number of top scores kept in each game leaderboard
+GAMES_LEADERBOARD_SIZE = 10
+
+# Player and game names offered by the player scores filter form,
+# cached for the number of seconds in the timeout
+GAMES_NAME_CHOICES_LIMIT = 100
+GAMES_NAME_CHOICES_TIMEOUT = 300
+
+# Game and player names kept in memory by each process for the
+# autocomplete endpoint, checked for writes of other processes every
+# number of seconds in the refresh
+GAMES_AUTOCOMPLETE_MAX_NAMES = 100000
+GAMES_AUTOCOMPLETE_REFRESH = 5
+GAMES_AUTOCOMPLETE_LIMIT = 10
+GAMES_AUTOCOMPLETE_MAX_LIMIT = 50
+
+# Player and game stats are cached until the scores change, or for the
+# number of seconds in the timeout. The game score histograms have up
+# to the number of buckets.
+GAMES_STATS_CACHE_TIMEOUT = 300
+GAMES_STATS_HISTOGRAM_BUCKETS = 10
+
+# Verified basic authentication credentials kept by each process
+# and the number of seconds they are trusted
+GAMES_CREDENTIALS_CACHE_SIZE = 1000
+GAMES_CREDENTIALS_CACHE_TIMEOUT = 300
+
+# Maximum number of scores in a bulk score ingestion request
+GAMES_BULK_SCORES_LIMIT = 10000
+
+# Paginated counts are cached for the number of seconds in the timeout
+# and stop at the threshold
+GAMES_COUNT_CACHE_TIMEOUT = 60
+GAMES_COUNT_THRESHOLD = 10000
+
+# Number of related rows nested in each user and game category, the
+# rest are counted and linked
+GAMES_NESTED_LIMIT = 10
+
+# Number of rows retrieved by each query of the player scores export
+GAMES_EXPORT_CHUNK_SIZE = 1000
+
+# Games, players and player scores are represented with generated
+# functions instead of walking the serializer fields for every row
+GAMES_COMPILED_SERIALIZERS = True
+
+# SQLite file with the throttling token buckets shared by all the workers
+GAMES_THROTTLE_DATABASE = os.path.join(BASE_DIR, 'throttle.sqlite3')
+
+# Worker threads that run the views for the ASGI application in
+# gamesapi/asgi.py, the event loop serves the slow clients
+GAMES_ASGI_THREADS = 10
+
+# Fraction of the requests that keep their SQL, and the milliseconds
+# after which those are logged as slow requests with their queries
+GAMES_SLOW_REQUEST_SAMPLE_RATE = 0
+GAMES_SLOW_REQUEST_THRESHOLD = 500
+
 # We want to use nose to run all the tests
 TEST_RUNNER = 'django_nose.NoseTestSuiteRunner'
 